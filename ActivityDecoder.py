@@ -0,0 +1,89 @@
+import json
+import threading
+
+_WHITESPACE = ' \t\n\r,'
+
+
+class ActivityDecoder:
+    """
+    活动列表的增量解码器
+
+    两次轮询之间通常只有少数活动的报名人数变化。解码一页时逐个查看results中的活动：
+    原文与上一次该分页同一位置的活动完全相同时直接复用上次的对象，只用JSONDecoder.raw_decode
+    解码发生变化的活动。
+
+    复用的活动对象会在多次轮询之间共享，调用方不能修改它们。
+    分页中插入或删除活动使位置错开时，之后的活动都会重新解码；响应结构不符合预期时整页回退为json.loads。
+    """
+
+    def __init__(self):
+        self._raw_decode = json.JSONDecoder().raw_decode
+        self._page_cache = {}  # 分页 -> [(活动原文, 活动), ...]
+        self._lock = threading.Lock()
+        self.stats = {'pages': 0, 'decoded': 0, 'reused': 0, 'fallbacks': 0}
+
+    def decode_page(self, body, page=1):
+        """
+        解码一页活动列表
+
+        Args:
+            body: 原始响应体（bytes）
+            page: 页码，用于复用上一次该分页中未变化的活动
+
+        Returns:
+            dict: 与response.json()结构相同
+        """
+        text = body.decode('utf-8')
+        try:
+            data, entries, decoded = self._decode_results(text, self._page_cache.get(page, ()))
+        except (ValueError, IndexError):
+            with self._lock:
+                self.stats['pages'] += 1
+                self.stats['fallbacks'] += 1
+            self._page_cache.pop(page, None)
+            return json.loads(text)
+
+        self._page_cache[page] = entries
+        with self._lock:
+            self.stats['pages'] += 1
+            self.stats['decoded'] += decoded
+            self.stats['reused'] += len(entries) - decoded
+        return data
+
+    def _decode_results(self, text, previous):
+        """
+        Returns:
+            tuple: (解码后的数据, 本次的(活动原文, 活动)列表, 新解码的活动数)
+        """
+        start = text.index('"results"')
+        pos = text.index('[', start) + 1
+        if text[start + len('"results"'):pos - 1].strip(' \t\n\r:'):
+            raise ValueError("results不是数组")
+
+        raw_decode = self._raw_decode
+        entries = []
+        decoded = 0
+        while True:
+            while text[pos] in _WHITESPACE:
+                pos += 1
+            if text[pos] == ']':
+                break
+
+            index = len(entries)
+            # 活动对象以完整的'}'结束，与上次的原文前缀相同就是同一个对象
+            if index < len(previous) and text.startswith(previous[index][0], pos):
+                entry = previous[index]
+                end = pos + len(entry[0])
+            else:
+                activity, end = raw_decode(text, pos)
+                if not isinstance(activity, dict):
+                    raise ValueError("活动不是对象")
+                entry = (text[pos:end], activity)
+                decoded += 1
+            entries.append(entry)
+            pos = end
+
+        # 除results外的顶层字段（count等）很小，照常解码
+        data = json.loads(text[:start] + '"results": null' + text[pos + 1:])
+        data['results'] = [activity for _, activity in entries]
+        return data, entries, decoded
@@ -0,0 +1,202 @@
+import re
+import logging
+import threading
+from datetime import datetime, time as dtime
+
+
+class ActivityFilter:
+    """
+    报名规则
+
+    规则在创建时编译为谓词函数，apply_activities只需对本轮检测到的少量活动逐条求值。
+    配置示例：
+
+        {
+            'rules': [
+                {'category': ['文体活动'], 'action': 'skip'},
+                {'category': ['学术讲座'], 'college': ['计算机学院'], 'priority': 10},
+                {'address': '思源|逸夫', 'weekdays': [1, 2, 3, 4, 5], 'start_after': '08:00',
+                 'end_before': '18:00', 'priority': 5},
+            ],
+            'default': 'skip',
+            'avoid_conflicts': True,
+        }
+
+    规则按顺序匹配，第一条满足的规则决定是否报名（action为'apply'或'skip'，默认'apply'）及优先级；
+    都不满足时按default处理。一条规则中的条件需要同时满足：
+    - category: 活动类别（category_txts）中有任意一个在列表中
+    - college: 发布学院（college_txt）在列表中
+    - address: 活动地点（address）匹配该正则表达式
+    - weekdays: 活动开始日是星期几（1-7）
+    - start_after / start_before / end_before: 开始、结束时间的时刻范围，格式为'HH:MM'
+    - date_from / date_to: 活动开始日期范围，格式为'YYYY-MM-DD'
+    avoid_conflicts为True时，跳过与已报名活动时间重叠的活动。
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config: 规则配置字典，格式见类说明
+        """
+        self.rules = [self._compile_rule(rule) for rule in config.get('rules', [])]
+        self.default_apply = self._parse_action(config.get('default', 'apply'))
+        self.avoid_conflicts = config.get('avoid_conflicts', False)
+
+        # 已报名活动的时间段
+        self._booked = []
+        self._lock = threading.Lock()
+
+    def select(self, activities):
+        """
+        从本轮检测到的活动中选出要报名的活动，并按优先级排序
+
+        优先级相同时保持原顺序。开启avoid_conflicts时，与已报名活动或本轮中
+        优先级更高的活动时间重叠的活动会被跳过。
+
+        Args:
+            activities: check_new_activity返回的活动列表
+
+        Returns:
+            list: 按优先级从高到低排列的待报名活动
+        """
+        candidates = []
+        for index, activity in enumerate(activities):
+            priority = self.match(activity)
+            if priority is None:
+                logging.info(f"不符合报名规则，跳过: {activity.get('name')} (ID: {activity.get('id')})")
+                continue
+            candidates.append((-priority, index, activity))
+
+        candidates.sort(key=lambda item: item[:2])
+        selected = [activity for _, _, activity in candidates]
+        if not self.avoid_conflicts:
+            return selected
+
+        with self._lock:
+            booked = list(self._booked)
+
+        result = []
+        for activity in selected:
+            span = _time_span(activity)
+            if span is not None and _overlaps(booked, span):
+                logging.info(f"与已报名活动时间冲突，跳过: {activity.get('name')} (ID: {activity.get('id')})")
+                continue
+            result.append(activity)
+            if span is not None:
+                booked.append(span)
+        return result
+
+    def match(self, activity):
+        """
+        Returns:
+            int: 需要报名时返回优先级，不报名时返回None
+        """
+        for predicate, apply, priority in self.rules:
+            if predicate(activity):
+                return priority if apply else None
+        return 0 if self.default_apply else None
+
+    def carry_over(self, other):
+        """沿用另一个ActivityFilter中已报名活动的时间段，重新加载规则后冲突检查不会遗漏之前的报名"""
+        with other._lock:
+            booked = list(other._booked)
+        with self._lock:
+            self._booked.extend(booked)
+
+    def record_applied(self, activity):
+        """报名成功后记录活动时间段，用于之后的冲突检查"""
+        span = _time_span(activity)
+        if span is None:
+            return
+        with self._lock:
+            self._booked.append(span)
+
+    def _compile_rule(self, rule):
+        checks = []
+
+        if 'category' in rule:
+            categories = frozenset(rule['category'])
+            checks.append(lambda a: not categories.isdisjoint(a.get('category_txts') or ()))
+
+        if 'college' in rule:
+            colleges = frozenset(rule['college'])
+            checks.append(lambda a: a.get('college_txt') in colleges)
+
+        if 'address' in rule:
+            search = re.compile(rule['address']).search
+            checks.append(lambda a: search(a.get('address') or '') is not None)
+
+        if 'weekdays' in rule:
+            weekdays = frozenset(rule['weekdays'])
+            checks.append(lambda a: _check_time(a, 'start_time', lambda t: t.isoweekday() in weekdays))
+
+        for key, field, compare in (('start_after', 'start_time', lambda t, limit: t.time() >= limit),
+                                    ('start_before', 'start_time', lambda t, limit: t.time() <= limit),
+                                    ('end_before', 'end_time', lambda t, limit: t.time() <= limit)):
+            if key in rule:
+                checks.append(_time_check(field, compare, dtime.fromisoformat(rule[key])))
+
+        if 'date_from' in rule:
+            date_from = datetime.strptime(rule['date_from'], '%Y-%m-%d').date()
+            checks.append(lambda a: _check_time(a, 'start_time', lambda t: t.date() >= date_from))
+
+        if 'date_to' in rule:
+            date_to = datetime.strptime(rule['date_to'], '%Y-%m-%d').date()
+            checks.append(lambda a: _check_time(a, 'start_time', lambda t: t.date() <= date_to))
+
+        unknown = set(rule) - {'category', 'college', 'address', 'weekdays', 'start_after', 'start_before',
+                               'end_before', 'date_from', 'date_to', 'action', 'priority'}
+        if unknown:
+            raise ValueError(f"未知的规则条件: {', '.join(sorted(unknown))}")
+
+        if not checks:
+            predicate = _always
+        elif len(checks) == 1:
+            predicate = checks[0]
+        else:
+            predicate = lambda a: all(check(a) for check in checks)
+
+        return predicate, self._parse_action(rule.get('action', 'apply')), rule.get('priority', 0)
+
+    @staticmethod
+    def _parse_action(action):
+        if action not in ('apply', 'skip'):
+            raise ValueError(f"未知的规则动作: {action}")
+        return action == 'apply'
+
+
+def _always(activity):
+    return True
+
+
+def _parse_time(value):
+    """解析'2025-11-20T14:00:00+08:00'格式的时间，按活动当地时间比较，忽略时区"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _check_time(activity, field, check):
+    value = _parse_time(activity.get(field))
+    return value is not None and check(value)
+
+
+def _time_check(field, compare, limit):
+    return lambda a: _check_time(a, field, lambda t: compare(t, limit))
+
+
+def _time_span(activity):
+    start = _parse_time(activity.get('start_time'))
+    end = _parse_time(activity.get('end_time'))
+    if start is None or end is None:
+        return None
+    return start, end
+
+
+def _overlaps(booked, span):
+    """判断span是否与booked中的任意时间段重叠，已报名活动很少，直接逐个比较"""
+    start, end = span
+    return any(other_start < end and start < other_end for other_start, other_end in booked)
@@ -1,25 +1,45 @@
 import requests
 import time
 import json
+import math
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from requests.structures import CaseInsensitiveDict
 from datetime import datetime
 import logging
-from EmailNotifier import EmailNotifier
 from TokenManager import TokenManager
+from PollScheduler import PollScheduler
+from ApplyDispatcher import ApplyDispatcher
+from ApplyRetry import ApplyRetry
+from Transport import Transport
+from RequestGovernor import RequestGovernor, APPLY, TOKEN, POLL, PAGE, parse_retry_after
+from ActivityDecoder import ActivityDecoder
+from ActivityFilter import ActivityFilter
+from EventBus import (EventBus, EmailSink, JsonlSink, UnixSocketSink, ActivityOpened, SlotFreed,
+                      ApplySucceeded, ApplyFailed, TokenRefreshed)
+import Metrics
 import jwt
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('activity_monitor.log'),
-        logging.StreamHandler()
-    ]
-)
-
+# 热路径指标
+FETCH_NETWORK_SECONDS = Metrics.histogram('activity_fetch_network_seconds', '获取单页活动的网络耗时')
+FETCH_DECODE_SECONDS = Metrics.histogram('activity_fetch_decode_seconds', '单页活动JSON解析耗时')
+FETCH_PAGES_TOTAL = Metrics.counter('activity_fetch_pages_total', '获取活动分页的次数', ('result',))
+DIFF_SECONDS = Metrics.histogram('activity_diff_seconds', 'check_new_activity耗时')
+APPLY_POST_SECONDS = Metrics.histogram('apply_post_seconds', '单个报名请求耗时')
+APPLY_POSTS_TOTAL = Metrics.counter('apply_posts_total', '报名请求次数', ('status',))
+TOKEN_REFRESH_SECONDS = Metrics.histogram('token_refresh_seconds', '刷新token耗时')
+TOKEN_REFRESH_TOTAL = Metrics.counter('token_refresh_total', '刷新token次数', ('result',))
 
 class ActivityMonitor:
-    def __init__(self, base_url, tokenfile, sno, smtp_config=None, check_interval=2):
+    def __init__(self, base_url, tokenfile, sno, smtp_config=None, check_interval=2,
+                 page_size=10, fetch_concurrency=16, scheduler=None, apply_concurrency=8, latency_log=None,
+                 diff_engine='dict', state_db=None, metrics_port=None, record_feed=None,
+                 incremental_decode=False, event_log=None, event_socket=None,
+                 apply_rules=None, apply_retry=False, transport=None, request_budget=None,
+                 control_port=None, control_socket=None, config_file=None, sweep_interval=None,
+                 control_token=None):
         """
         初始化活动监控器
 
@@ -27,11 +47,35 @@ class ActivityMonitor:
             base_url: API基础URL
             jwt_token: JWT认证令牌
             check_interval: 检查间隔时间（秒）
+            page_size: 分页获取活动列表时每页的数量
+            fetch_concurrency: 并发获取分页的最大请求数
+            scheduler: 轮询调度器，默认使用以check_interval为常规间隔的PollScheduler
+            apply_concurrency: 并发报名请求数
+            latency_log: 报名延迟记录的CSV文件路径
+            diff_engine: 'dict'使用逐项比较的缓存字典，'columnar'使用列式快照整体比较
+            state_db: 保存活动缓存和已报名活动的SQLite文件路径，None表示只保存在内存中
+            metrics_port: 本地指标服务端口（Prometheus文本格式，/metrics），None表示不启动
+            record_feed: 记录活动列表原始响应的文件路径，可用FeedRecorder.py回放，None表示不记录
+            incremental_decode: 是否增量解码活动列表，只解码与上次相比发生变化的活动
+            event_log: 把事件逐行写入的JSONL文件路径，None表示不写
+            event_socket: 广播事件的本地Unix socket路径，None表示不启用
+            apply_rules: 报名规则配置（格式见ActivityFilter），None表示报名所有检测到的活动
+            apply_retry: 名额被抢时是否在短时间窗口内重试，True使用默认参数，也可以传入ApplyRetry的参数字典
+            transport: Transport的参数字典（pool_size、dns_ttl、keepalive_interval）
+            request_budget: 请求预算，True使用RequestGovernor的默认参数，也可以传入参数字典，
+                或传入RequestGovernor实例与其他监控器共享；None表示不限制
+            control_port: 本地控制接口的HTTP端口（见ControlServer），None表示不启动
+            control_socket: 本地控制接口的Unix socket路径，None表示不启动
+            config_file: 控制接口reload命令读取的JSON配置文件路径
+            sweep_interval: 开启先探测后获取的分页方式：第一页的活动总数和名额指纹未变化时不请求其余分页，
+                最多每隔sweep_interval秒完整获取一次；None表示每次轮询都获取全部分页
+            control_token: 控制接口的共享口令，设置后请求需要带X-Control-Token头，None表示不检查
         """
         self.base_url = base_url.rstrip('/')
 
 
-        self.token_manager = TokenManager(tokenfile, headless=False)
+        # 每个学号使用独立的浏览器配置目录，多账号时不会复用到其他账号的登录状态
+        self.token_manager = TokenManager(tokenfile, headless=False, profile_dir=f'chrome_profile_{sno}')
         self.token = None
         self.sno = sno
 
@@ -44,6 +88,12 @@ class ActivityMonitor:
 
         self.leeway = 60 * 60 * 24
 
+        # 后台刷新token的状态
+        self._token_lock = threading.Lock()
+        self._refresh_thread = None
+        self._refresh_retry_delay = 60
+        self._next_refresh_attempt = 0
+
         self.headers = {
             'Authorization': f'JWT {self.token}',
             'X-Access-Token': self.token,
@@ -51,14 +101,113 @@ class ActivityMonitor:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         self.check_interval = check_interval
+        self.scheduler = scheduler or PollScheduler(check_interval)
+        self.page_size = page_size
+        self.fetch_concurrency = max(1, fetch_concurrency)
+
         self.session = requests.Session()
         self.session.headers.update(self.headers)
 
-        self.email_notifier = EmailNotifier(smtp_config) if smtp_config else None
+        # 连接池大小需覆盖并发分页和报名请求，否则多余的连接会在用完后被丢弃
+        transport_options = dict(transport or {})
+        transport_options.setdefault('pool_size', self.fetch_concurrency + apply_concurrency)
+        self.transport = Transport(self.base_url, **transport_options)
+        self.session.mount('http://', self.transport)
+        self.session.mount('https://', self.transport)
+        self._fetch_executor = None
+
+        # 所有请求经过_request按类别使用共享的请求预算
+        if isinstance(request_budget, RequestGovernor):
+            self.request_governor = request_budget
+        elif request_budget:
+            self.request_governor = RequestGovernor(**(request_budget if isinstance(request_budget, dict) else {}))
+        else:
+            self.request_governor = None
+
+        # 报名接口返回Retry-After时，在此time.monotonic()之前不再重试报名
+        self.apply_blocked_until = 0
+
+        # 分页响应缓存：(page, limit) -> ETag/Last-Modified校验值、响应体哈希和解析结果
+        self._page_cache = {}
+        # 先探测后获取：上次完整获取时第一页的指纹、其余分页的活动和下一次完整获取的时间
+        self.sweep_interval = sweep_interval
+        self._probe_fingerprint = None
+        self._rest_results = []
+        self._next_sweep = 0
+        self.last_fetch_unchanged = False
+        self.last_error_status = None
+        self._stats_lock = threading.Lock()
+        self.feed_recorder = None
+        if record_feed:
+            from FeedRecorder import FeedRecorder
+            self.feed_recorder = FeedRecorder(record_feed)
+        self.activity_decoder = ActivityDecoder() if incremental_decode else None
+        self.fetch_stats = {
+            'polls': 0,  # 完整轮询次数
+            'polls_unchanged': 0,  # 内容未变化、跳过比较的轮询次数
+            'requests': 0,  # 分页请求次数
+            'not_modified': 0,  # 服务器返回304的次数
+            'hash_hits': 0,  # 响应体哈希未变化、跳过JSON解析的次数
+            'probe_hits': 0,  # 第一页指纹未变化、跳过其余分页的轮询次数
+        }
+
+        # 可选功能的模块在启用时才导入，减少启动时间
+        self.email_notifier = None
+        if smtp_config:
+            from EmailNotifier import EmailNotifier
+            self.email_notifier = EmailNotifier(smtp_config)
+
+        # 检测、报名结果和token刷新以事件形式发布，邮件等订阅者在各自的线程中处理
+        self.event_bus = EventBus()
+        self._email_subscription = None
+        if self.email_notifier:
+            self._email_subscription = self.event_bus.subscribe(EmailSink(self), EmailSink.event_types, name='email')
+        if event_log:
+            self.event_bus.subscribe(JsonlSink(event_log), name='jsonl')
+        if event_socket:
+            self.event_bus.subscribe(UnixSocketSink(event_socket), name='socket')
+
+        self.metrics_server = Metrics.MetricsServer(metrics_port).start() if metrics_port is not None else None
+        self.apply_dispatcher = ApplyDispatcher(self, max_workers=apply_concurrency,
+                                                warm_connections=min(4, apply_concurrency),
+                                                warm_interval=self.transport.keepalive_interval,
+                                                latency_log=latency_log)
+        if apply_retry:
+            self.apply_dispatcher.retry = ApplyRetry(self, **(apply_retry if isinstance(apply_retry, dict) else {}))
 
         # 存储活动状态用于比较
         self.previous_activities = {}
         self.applied_activities = {}
+        self.last_opened_ids = []  # 最近一次比较中首次出现就有余量的活动
+        self.capacity_snapshot = None
+        if diff_engine == 'columnar':
+            from CapacitySnapshot import CapacitySnapshot  # 导入numpy
+            self.capacity_snapshot = CapacitySnapshot()
+        self.activity_filter = ActivityFilter(apply_rules) if apply_rules else None
+
+        # 从磁盘恢复上次运行的状态，重启后不会重复报名
+        self.state_store = None
+        if state_db:
+            from StateStore import StateStore
+            self.state_store = StateStore(state_db)
+        if self.state_store:
+            previous_activities, applied_activities = self.state_store.load()
+            self.previous_activities.update(previous_activities)
+            self.applied_activities.update(applied_activities)
+            if self.capacity_snapshot is not None:
+                self.capacity_snapshot.load(previous_activities)
+            # 已报名活动的时间段继续用于冲突检查
+            self._restore_booked(self.activity_filter)
+
+        # 控制命令在监控循环的两次轮询之间依次执行
+        self.apply_paused = False
+        self.config_file = config_file
+        self._control_queue = queue.Queue()
+        self.control_server = None
+        if control_port is not None or control_socket:
+            from ControlServer import ControlServer
+            self.control_server = ControlServer(self, port=control_port, socket_path=control_socket,
+                                                token=control_token).start()
 
     def should_refresh_token(self):
         # 获取当前时间戳
@@ -73,20 +222,91 @@ class ActivityMonitor:
         else:
             return False
 
+    def start_token_refresh(self):
+        """
+        需要刷新token时在后台线程中刷新，立即返回
+
+        刷新期间轮询和报名继续使用旧token；刷新失败后按指数退避重试，直到旧token过期前。
+
+        Returns:
+            bool: 是否启动了新的刷新线程
+        """
+        if not self.should_refresh_token():
+            return False
+
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return False
+
+        if time.time() < self._next_refresh_attempt:
+            return False
+
+        logging.info("token即将过期，开始在后台刷新")
+        self._refresh_thread = threading.Thread(target=self._refresh_token_worker, name='token-refresh', daemon=True)
+        self._refresh_thread.start()
+        return True
+
+    def _refresh_token_worker(self):
+        try:
+            self.refresh_token()
+            self._refresh_retry_delay = 60
+            self._next_refresh_attempt = 0
+            logging.info("token刷新成功，已切换到新token")
+            self.event_bus.publish(TokenRefreshed(self.token_exp, self.sno))
+        except Exception as e:
+            self._next_refresh_attempt = time.time() + self._refresh_retry_delay
+            logging.error(f"后台刷新token失败，{self._refresh_retry_delay}秒后重试: {e}")
+            self._refresh_retry_delay = min(self._refresh_retry_delay * 2, 60 * 60)
+
     def refresh_token(self):
-        self.token = self.token_manager.get_token_automatically(self.sno)
-        if self.token is None:
+        # 浏览器获取token时同样访问API主机，与其他请求共用请求预算，优先级仅次于报名
+        governor = self.request_governor
+        if governor is not None and not governor.acquire(TOKEN, 60):
+            TOKEN_REFRESH_TOTAL.inc(labels=('throttled',))
+            raise RuntimeError("等待请求额度超时")
+
+        started = time.perf_counter()
+        # 浏览器配置中保存的存储里可能还是当前token，等待页面写入新token
+        token = self.token_manager.get_token_automatically(self.sno, stale_token=self.token)
+        TOKEN_REFRESH_SECONDS.observe(time.perf_counter() - started)
+
+        if token is None:
+            TOKEN_REFRESH_TOTAL.inc(labels=('failure',))
             logging.error("获取token失败")
             raise RuntimeError("获取token失败")
 
-        self.token_manager.write_token_to_file(self.token)
+        # 只接受比当前token更晚过期的token，否则视为刷新失败，按退避时间重试
+        exp = jwt.decode(token, options={"verify_signature": False}).get('exp')
+        if exp is None or exp <= self.token_exp:
+            TOKEN_REFRESH_TOTAL.inc(labels=('stale',))
+            logging.error("获取到的token没有比当前token更晚过期，可能是浏览器存储中的旧token")
+            raise RuntimeError("获取到的token没有更新")
 
-        payload = jwt.decode(self.token, options={"verify_signature": False})
-        self.token_exp = payload.get('exp')
+        TOKEN_REFRESH_TOTAL.inc(labels=('success',))
 
-        self.headers['Authorization'] = f'JWT {self.token}'
-        self.headers['X-Access-Token'] = self.token
-        self.session.headers.update(self.headers)
+        self.token_manager.write_token_to_file(token)
+        self._swap_token(token)
+
+    def _swap_token(self, token):
+        """
+        原子地切换到新token
+
+        构造新的headers后整体替换session.headers，而不是逐项修改；
+        正在发送的请求已经复制了旧的headers，不会出现两个认证头不一致的情况。
+        """
+        payload = jwt.decode(token, options={"verify_signature": False})
+
+        headers = dict(self.headers)
+        headers['Authorization'] = f'JWT {token}'
+        headers['X-Access-Token'] = token
+
+        session_headers = CaseInsensitiveDict(self.session.headers)
+        session_headers.update(headers)
+
+        with self._token_lock:
+            self.token = token
+            self.token_exp = payload.get('exp')
+            self.headers = headers
+            self.session.headers = session_headers
 
     def fetch_activities(self, page=1, limit=10):
         """
@@ -99,22 +319,180 @@ class ActivityMonitor:
         Returns:
             dict: 活动数据或None（如果请求失败）
         """
+        data, _ = self._fetch_page(page, limit)
+        return data
+
+    def _fetch_page(self, page, limit):
+        """
+        条件请求获取单页活动
+
+        服务器提供ETag/Last-Modified时发送条件请求，304直接复用上次结果；
+        否则对响应体做哈希，与上次相同则跳过JSON解析。
+
+        Returns:
+            tuple: (活动数据或None, 内容是否与上次相同)
+        """
+        key = (page, limit)
+        cached = self._page_cache.get(key)
+
         try:
             url = f"{self.base_url}/xuefenapi/activity/"
             params = {'page': page, 'limit': limit}
 
-            response = self.session.get(url, params=params, timeout=10)
+            headers = {}
+            if cached:
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
+
+            started = time.perf_counter()
+            # 第一页决定本次轮询能否继续，其余分页排在它后面
+            response = self._request('GET', url, POLL if page == 1 else PAGE, params=params, headers=headers,
+                                     timeout=10)
+            FETCH_NETWORK_SECONDS.observe(time.perf_counter() - started)
+            self._count('requests')
+
+            if self.feed_recorder:
+                self.feed_recorder.record(page, limit, response.status_code, response.content)
+
+            if response.status_code == 304 and cached:
+                self._count('not_modified')
+                FETCH_PAGES_TOTAL.inc(labels=('not_modified',))
+                return cached['data'], True
+
             response.raise_for_status()
 
-            return response.json()
+            digest = hashlib.blake2b(response.content, digest_size=16).digest()
+            if cached and cached['digest'] == digest:
+                self._count('hash_hits')
+                FETCH_PAGES_TOTAL.inc(labels=('hash_hit',))
+                return cached['data'], True
+
+            started = time.perf_counter()
+            if self.activity_decoder:
+                data = self.activity_decoder.decode_page(response.content, key)
+            else:
+                data = response.json()
+            FETCH_DECODE_SECONDS.observe(time.perf_counter() - started)
+            FETCH_PAGES_TOTAL.inc(labels=('parsed',))
+            self._page_cache[key] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'digest': digest,
+                'data': data,
+            }
+            return data, False
 
         except requests.exceptions.RequestException as e:
+            response = getattr(e, 'response', None)
+            self.last_error_status = response.status_code if response is not None else None
+            FETCH_PAGES_TOTAL.inc(labels=('error',))
             logging.error(f"请求失败: {e}")
-            return None
+            return None, False
         except json.JSONDecodeError as e:
+            FETCH_PAGES_TOTAL.inc(labels=('error',))
             logging.error(f"JSON解析失败: {e}")
+            return None, False
+
+    def _request(self, method, url, priority, budget_timeout=None, **kwargs):
+        """
+        通过session发送请求，配置了request_budget时先获取请求额度，并把响应反馈给RequestGovernor
+
+        Args:
+            method: HTTP方法
+            url: 请求URL
+            priority: 请求类别（RequestGovernor.APPLY、TOKEN、POLL、PAGE）
+            budget_timeout: 等待请求额度的最长时间（秒），None表示一直等待
+            kwargs: 其余参数传给session.request
+
+        Returns:
+            requests.Response: 响应；在budget_timeout内没有获得额度时返回None
+        """
+        governor = self.request_governor
+        if governor is None:
+            return self.session.request(method, url, **kwargs)
+
+        if not governor.acquire(priority, budget_timeout):
             return None
 
+        started = time.perf_counter()
+        response = self.session.request(method, url, **kwargs)
+        governor.observe(response.status_code, response.headers, time.perf_counter() - started)
+        return response
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self.fetch_stats[name] += value
+
+    def fetch_all_activities(self):
+        """
+        获取完整活动列表
+
+        先请求第一页得到总数count，再通过共享的session连接池并发请求其余分页，
+        最后按页码顺序合并结果。所有分页内容都与上次相同时，
+        last_fetch_unchanged置为True，调用方可以跳过比较。
+
+        设置了sweep_interval时，第一页作为探测：count和第一页活动的(id, used_capacity, capacity, status)
+        都与上次完整获取时相同、且未到完整获取时间时，不请求其余分页，沿用上次的结果，
+        同样置last_fetch_unchanged为True。第一页以外的名额变化最迟在sweep_interval秒后被发现。
+
+        Returns:
+            dict: {'count': 总数, 'results': 合并后的活动列表}或None（第一页请求失败）
+        """
+        self.last_fetch_unchanged = False
+
+        first_page, unchanged = self._fetch_page(1, self.page_size)
+        if not first_page or 'results' not in first_page:
+            return first_page
+
+        count = first_page.get('count', 0)
+        results = list(first_page['results'])
+        total_pages = math.ceil(count / self.page_size) if self.page_size > 0 else 1
+
+        fingerprint = None
+        if self.sweep_interval is not None and total_pages > 1:
+            fingerprint = (count, tuple((a['id'], a['used_capacity'], a['capacity'], a['status']) for a in results))
+            if fingerprint == self._probe_fingerprint and time.monotonic() < self._next_sweep:
+                self._count('probe_hits')
+                FETCH_PAGES_TOTAL.inc(total_pages - 1, labels=('probe_skipped',))
+                self.last_fetch_unchanged = True
+                self._count('polls')
+                self._count('polls_unchanged')
+                return {'count': count, 'results': results + self._rest_results}
+
+        if total_pages > 1:
+            if self._fetch_executor is None:
+                self._fetch_executor = ThreadPoolExecutor(max_workers=self.fetch_concurrency,
+                                                          thread_name_prefix='fetch')
+
+            pages = range(2, total_pages + 1)
+            futures = [self._fetch_executor.submit(self._fetch_page, page, self.page_size) for page in pages]
+
+            complete = True
+            for page, future in zip(pages, futures):
+                data, page_unchanged = future.result()
+                if data and 'results' in data:
+                    results.extend(data['results'])
+                    unchanged = unchanged and page_unchanged
+                else:
+                    unchanged = complete = False
+                    # 缺失的分页中的活动保持上一次的缓存状态，不会被误判
+                    logging.warning(f"获取第 {page} 页活动失败，本次轮询跳过该页")
+
+            if fingerprint is not None:
+                # 有分页失败时不记录指纹，下次轮询重新完整获取
+                self._probe_fingerprint = fingerprint if complete else None
+                self._rest_results = results[len(first_page['results']):]
+                self._next_sweep = time.monotonic() + self.sweep_interval
+
+        self.last_fetch_unchanged = unchanged
+        self._count('polls')
+        if unchanged:
+            self._count('polls_unchanged')
+
+        return {'count': count, 'results': results}
+
     def check_new_activity(self, activities):
         """
         检查活动容量变化并触发警报
@@ -122,9 +500,34 @@ class ActivityMonitor:
         Args:
             activities: 活动列表
         """
+        started = time.perf_counter()
+        res = self._diff_activities(activities)
+        DIFF_SECONDS.observe(time.perf_counter() - started)
+
+        retry = self.apply_dispatcher.retry
+        if retry is not None and retry.active:
+            retry.observe(activities)
+
+        if res and self.event_bus.has_subscribers:
+            opened = set(self.last_opened_ids)
+            for activity in res:
+                event_type = ActivityOpened if activity['id'] in opened else SlotFreed
+                self.event_bus.publish(event_type(activity, self.sno))
+        return res
+
+    def _diff_activities(self, activities):
+        if self.capacity_snapshot is not None:
+            res = self.capacity_snapshot.diff(activities)
+            self.last_opened_ids = self.capacity_snapshot.last_opened
+            if self.state_store:
+                self._persist_snapshot_changes()
+            return res
+
+        state_store = self.state_store
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
         res = []
+        opened = []
 
         for activity in activities:
             status = activity['status']
@@ -136,6 +539,8 @@ class ActivityMonitor:
             if status != '报名中':
                 if activity_id in self.previous_activities:
                     self.previous_activities.pop(activity_id)
+                    if state_store:
+                        state_store.delete_tracked(activity_id)
                 continue
 
             # 记录当前状态
@@ -151,7 +556,10 @@ class ActivityMonitor:
                 # 若有余量
                 if used_capacity < capacity:
                     res.append(activity)
+                    opened.append(activity_id)
                 self.previous_activities[activity_id] = current_status
+                if state_store:
+                    state_store.put_tracked(activity_id, current_status)
                 continue
 
             # 在缓存中，现在无余量
@@ -160,6 +568,8 @@ class ActivityMonitor:
                 if self.previous_activities[activity_id]['used_capacity'] < self.previous_activities[activity_id][
                     'capacity']:
                     self.previous_activities[activity_id] = current_status
+                    if state_store:
+                        state_store.put_tracked(activity_id, current_status)
                 continue
 
             # 在缓存中，现在有余量
@@ -174,60 +584,123 @@ class ActivityMonitor:
 
             # 更新前一次状态
             self.previous_activities[activity_id] = current_status
+            if state_store:
+                state_store.put_tracked(activity_id, current_status)
 
+        self.last_opened_ids = opened
         return res
 
-    def apply_activities(self, activities):
+    def _persist_snapshot_changes(self):
+        """把列式快照最近一次比较中的变化写入状态存储"""
+        snapshot = self.capacity_snapshot
+        for activity_id in snapshot.last_updated:
+            self.state_store.put_tracked(activity_id, snapshot.get(activity_id))
+        for activity_id in snapshot.last_removed:
+            self.state_store.delete_tracked(activity_id)
+
+    def apply_activities(self, activities, detected_at=None):
         """
         自动报名活动
 
+        按报名规则筛选并排序后，所有活动的报名请求并发发出，优先级高的先发出；全部完成后再发送结果邮件
+
         Args:
-            activity: 活动信息字典
+            activities: 活动信息字典列表
+            detected_at: 检测到活动时的time.perf_counter()值，用于统计报名延迟
         """
-        for activity in activities:
-            activity_id = activity.get('id')
-            activity_name = activity.get('name', '未知活动')
+        if self.apply_paused and activities:
+            logging.info(f"报名已暂停，跳过 {len(activities)} 个可报名活动", extra={'rate_limited': True})
+            return
+        self.apply_dispatcher.dispatch(self.select_activities(activities), detected_at)
 
-            # 检查是否已经尝试过报名
-            if self.applied_activities.get(activity_id):
-                continue
+    def select_activities(self, activities):
+        """按报名规则筛选活动并按优先级排序，没有配置规则时原样返回"""
+        if self.activity_filter is None or not activities:
+            return activities
+        return self.activity_filter.select(activities)
 
-            try:
-                # 构建报名请求数据
-                apply_data = {
-                    "activity": activity_id,  # 关键参数：活动ID
-                    "student": self.sno
-                }
+    def _post_apply(self, activity):
+        """
+        发送单个活动的报名请求（不发送邮件）
 
-                logging.info(f"尝试自动报名活动: {activity_name} (ID: {activity_id})")
+        Args:
+            activity: 活动信息字典
 
-                # 发送报名请求
-                response = self.session.post(
-                    f"{self.base_url}/xuefenapi/applysign/",
-                    json=apply_data,
-                    timeout=10
-                )
+        Returns:
+            tuple: (activity, 是否成功, 错误信息, HTTP状态码)；跳过或发生异常时返回None
+        """
+        activity_id = activity.get('id')
+        activity_name = activity.get('name', '未知活动')
 
-                # 记录到已尝试集合
+        # 检查是否已经尝试过报名
+        if self.applied_activities.get(activity_id):
+            return None
 
-                # 解析响应
-                if response.status_code // 100 == 2:
-                    self.applied_activities[activity_id] = 1
+        try:
+            # 构建报名请求数据
+            apply_data = {
+                "activity": activity_id,  # 关键参数：活动ID
+                "student": self.sno
+            }
 
-                    success_msg = f"✅ 报名成功: {activity_name}"
-                    logging.info(success_msg)
-                    # 报名成功后发送确认邮件
-                    self._send_apply_success_email(activity)
+            logging.info(f"尝试自动报名活动: {activity_name} (ID: {activity_id})")
+
+            # 发送报名请求
+            started = time.perf_counter()
+            response = self._request(
+                'POST',
+                f"{self.base_url}/xuefenapi/applysign/",
+                APPLY,
+                json=apply_data,
+                timeout=10
+            )
+            APPLY_POST_SECONDS.observe(time.perf_counter() - started)
+            APPLY_POSTS_TOTAL.inc(labels=(response.status_code,))
+
+            # 解析响应
+            if response.status_code // 100 == 2:
+                self.applied_activities[activity_id] = 1
+                if self.state_store:
+                    self.state_store.put_applied(activity_id, activity.get('start_time'), activity.get('end_time'))
+                if self.activity_filter:
+                    self.activity_filter.record_applied(activity)
+
+                success_msg = f"✅ 报名成功: {activity_name}"
+                logging.info(success_msg)
+                return activity, True, None, response.status_code
+
+            if response.status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is not None:
+                    self.apply_blocked_until = max(self.apply_blocked_until, time.monotonic() + retry_after)
 
-                else:
-                    error_data = response.json()
-                    self._send_apply_fail_email(activity, error_data)
-                    fail_msg = f"报名请求失败，状态码: {response.status_code} 错误消息：{error_data }- {activity_name}"
-                    logging.error(fail_msg)
+            try:
+                error_data = response.json()
+            except ValueError:
+                error_data = {'detail': response.text[:200]}
+            fail_msg = f"报名请求失败，状态码: {response.status_code} 错误消息：{error_data }- {activity_name}"
+            logging.error(fail_msg)
+            return activity, False, error_data, response.status_code
 
-            except Exception as e:
-                error_msg = f"报名过程发生未知错误: {activity_name} - {str(e)}"
-                logging.error(error_msg)
+        except Exception as e:
+            error_msg = f"报名过程发生未知错误: {activity_name} - {str(e)}"
+            logging.error(error_msg)
+            return None
+
+    def _publish_apply_result(self, activity, success, error_data):
+        """发布报名结果事件，邮件由订阅者发送"""
+        if success:
+            self.event_bus.publish(ApplySucceeded(activity, self.sno))
+        else:
+            self.event_bus.publish(ApplyFailed(activity, error_data, self.sno))
+
+    def _notify_apply_result(self, activity, success, error_data):
+        """根据报名结果发送成功或失败邮件"""
+        if success:
+            # 报名成功后发送确认邮件
+            self._send_apply_success_email(activity)
+        else:
+            self._send_apply_fail_email(activity, error_data)
 
     def _send_apply_success_email(self, activity):
         """发送报名成功确认邮件"""
@@ -382,6 +855,176 @@ class ActivityMonitor:
 
         return html_content
 
+    def submit_control(self, command):
+        """
+        提交一个控制命令，由监控循环在两次轮询之间执行，可以从其他线程调用
+
+        Args:
+            command: 无参数的函数
+
+        Returns:
+            Future: 命令的返回值或异常
+        """
+        future = Future()
+        self._control_queue.put((command, future))
+        self.scheduler.wake()
+        return future
+
+    def _apply_control_changes(self):
+        """执行所有待执行的控制命令，只在监控循环中调用"""
+        while True:
+            try:
+                command, future = self._control_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(command())
+            except Exception as e:
+                future.set_exception(e)
+
+    def inspect(self, include_activities=False):
+        """
+        返回监控器的当前状态
+
+        Args:
+            include_activities: 是否包含跟踪中的活动和已报名活动ID
+
+        Returns:
+            dict: 可JSON序列化的状态
+        """
+        status = {
+            'sno': self.sno,
+            'check_interval': self.check_interval,
+            'poll_mode': self.scheduler.mode,
+            'apply_paused': self.apply_paused,
+            'apply_rules': self.activity_filter is not None,
+            'email': self.email_notifier is not None,
+            'token_exp': self.token_exp,
+            'fetch_stats': dict(self.fetch_stats),
+            'tracked_count': len(self.capacity_snapshot.items() if self.capacity_snapshot is not None
+                                 else self.previous_activities),
+            'applied_count': len(self.applied_activities),
+        }
+        if include_activities:
+            tracked = self.capacity_snapshot.items() if self.capacity_snapshot is not None else self.previous_activities
+            status['tracked'] = [dict(state, id=activity_id) for activity_id, state in tracked.items()]
+            status['applied'] = list(self.applied_activities)
+        return status
+
+    def poll_now(self):
+        """立即开始下一次轮询"""
+        self.scheduler.poll_now()
+
+    def set_check_interval(self, interval):
+        """修改常规轮询间隔（秒）"""
+        if not interval or interval <= 0:
+            raise ValueError(f"轮询间隔必须大于0: {interval}")
+        self.check_interval = interval
+        self.scheduler.set_interval(interval)
+        logging.info(f"轮询间隔已修改为 {interval} 秒")
+
+    def set_apply_paused(self, paused):
+        """暂停或恢复自动报名，暂停期间仍然轮询和比较"""
+        self.apply_paused = paused
+        logging.info("自动报名已暂停" if paused else "自动报名已恢复")
+
+    def reload_config(self, config=None):
+        """
+        重新加载配置
+
+        先构造新的报名规则和邮件通知器，全部成功后才替换，任何一项出错都不会修改当前配置。
+
+        Args:
+            config: 配置字典，可包含check_interval、smtp_config、apply_rules；
+                None表示读取config_file
+
+        Returns:
+            list: 已修改的配置项
+        """
+        if config is None:
+            config = self.load_config_file()
+
+        if config.get('sno', self.sno) != self.sno:
+            raise ValueError("修改学号需要重新获取token，请重启监控器")
+        unknown = set(config) - {'sno', 'check_interval', 'smtp_config', 'apply_rules'}
+        if unknown:
+            raise ValueError(f"不支持重新加载的配置项: {', '.join(sorted(unknown))}")
+
+        interval = config.get('check_interval', self.check_interval)
+        if not interval or interval <= 0:
+            raise ValueError(f"轮询间隔必须大于0: {interval}")
+
+        if 'apply_rules' in config:
+            activity_filter = self._build_activity_filter(config['apply_rules'])
+
+        if config.get('smtp_config'):
+            from EmailNotifier import EmailNotifier
+            email_notifier = EmailNotifier(config['smtp_config'])
+        else:
+            email_notifier = None
+
+        changed = []
+        if interval != self.check_interval:
+            self.set_check_interval(interval)
+            changed.append('check_interval')
+
+        if 'apply_rules' in config:
+            self.activity_filter = activity_filter
+            changed.append('apply_rules')
+
+        if 'smtp_config' in config:
+            self._replace_email_notifier(email_notifier)
+            changed.append('smtp_config')
+
+        logging.info(f"配置已重新加载: {', '.join(changed) if changed else '无变化'}")
+        return changed
+
+    def load_config_file(self):
+        """读取config_file中的配置字典"""
+        if not self.config_file:
+            raise ValueError("没有指定配置文件")
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def set_apply_rules(self, apply_rules):
+        """替换报名规则，apply_rules为空时不再筛选"""
+        self.activity_filter = self._build_activity_filter(apply_rules)
+        logging.info("报名规则已更新" if apply_rules else "报名规则已清除")
+
+    def _build_activity_filter(self, apply_rules):
+        """按报名规则构造ActivityFilter，没有规则时返回None"""
+        activity_filter = ActivityFilter(apply_rules) if apply_rules else None
+        # 已报名活动的时间段继续用于冲突检查；之前没有规则时从状态数据库恢复
+        if activity_filter is not None and self.activity_filter is not None:
+            activity_filter.carry_over(self.activity_filter)
+        else:
+            self._restore_booked(activity_filter)
+        return activity_filter
+
+    def _restore_booked(self, activity_filter):
+        """把状态数据库中已报名活动的时间段加入activity_filter"""
+        if activity_filter is None or not self.state_store:
+            return
+        self.state_store.flush()
+        for activity in self.state_store.load_booked():
+            activity_filter.record_applied(activity)
+
+    def _replace_email_notifier(self, email_notifier):
+        old, self.email_notifier = self.email_notifier, email_notifier
+
+        if email_notifier is not None and self._email_subscription is None:
+            self._email_subscription = self.event_bus.subscribe(EmailSink(self), EmailSink.event_types, name='email')
+        elif email_notifier is None and self._email_subscription is not None:
+            subscription, self._email_subscription = self._email_subscription, None
+            threading.Thread(target=self.event_bus.unsubscribe, args=(subscription,), daemon=True).start()
+
+        # 旧通知器在后台发完队列中的邮件，不阻塞监控循环
+        if old is not None:
+            threading.Thread(target=old.close, name='email-close', daemon=True).start()
+
     def test_apply(self):
         apply_data = {
             "activity": 4501,  # 关键参数：活动ID
@@ -389,8 +1032,10 @@ class ActivityMonitor:
         }
 
         # 发送报名请求
-        response = self.session.post(
+        response = self._request(
+            'POST',
             f"{self.base_url}/xuefenapi/applysign/",
+            APPLY,
             json=apply_data,
             timeout=10
         )
@@ -405,9 +1050,13 @@ class ActivityMonitor:
         activity = data['results'][0]
         self._send_apply_success_email(activity)
 
-    def monitor_loop(self):
+    def monitor_loop(self, raise_on_error=False):
         """
         主监控循环
+
+        Args:
+            raise_on_error: 发生未处理的异常时是否在记录日志后重新抛出，由Supervisor使用；
+                False时记录日志后返回
         """
         logging.info("开始监控活动名额...")
         print("🚀 活动名额监控器已启动")
@@ -416,35 +1065,47 @@ class ActivityMonitor:
 
         try:
             while True:
+                # 控制命令在轮询之间执行，一次轮询中使用的配置不会变化
+                self._apply_control_changes()
+
                 # 获取活动数据
-                data = self.fetch_activities()
+                data = self.fetch_all_activities()
+                detected_at = time.perf_counter()
 
                 if data and 'results' in data:
                     activities = data['results']
                     total_count = data.get('count', 0)
+                    self.scheduler.record_success()
 
                     # 记录基础信息
-                    logging.info(f"检测到 {len(activities)} 个活动 (总计: {total_count})")
+                    logging.info(f"检测到 {len(activities)} 个活动 (总计: {total_count})", extra={'rate_limited': True})
 
-                    # 检查活动容量
-                    can_applies = self.check_new_activity(activities)
+                    # 内容与上次轮询完全相同时，比较结果必然为空，直接跳过
+                    if not self.last_fetch_unchanged:
+                        self.scheduler.observe(activities)
 
-                    self.apply_activities(can_applies)
+                        # 检查活动容量
+                        can_applies = self.check_new_activity(activities)
 
+                        self.apply_activities(can_applies, detected_at)
 
                 else:
                     logging.error("获取活动数据失败或数据格式不正确")
+                    self.scheduler.record_error(self.last_error_status)
+
+                # token即将过期时在后台刷新，不阻塞轮询
+                self.start_token_refresh()
 
-                result = self.should_refresh_token()
-                if result:
-                    print('获取新token')
-                    self.refresh_token()
+                # 保持到API主机的连接处于可用状态
+                self.apply_dispatcher.keep_warm()
 
-                # 等待指定间隔
-                time.sleep(self.check_interval)
+                # 按调度器给出的绝对截止时间等待，等待期间收到的控制命令立即执行
+                self.scheduler.wait(self._apply_control_changes)
 
         except KeyboardInterrupt:
             logging.info("监控器被用户中断")
             print("\n👋 监控已停止")
         except Exception as e:
-            logging.error(f"监控循环发生错误: {e}")
\ No newline at end of file
+            logging.error(f"监控循环发生错误: {e}")
+            if raise_on_error:
+                raise
\ No newline at end of file
@@ -0,0 +1,130 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from Metrics import LatencyTracker
+from RequestGovernor import PAGE
+
+
+class ApplyDispatcher:
+    """
+    报名请求分发器
+
+    - 同一次轮询中所有可报名活动的报名请求并发发出
+    - 定期对API主机预热连接，报名请求无需重新建立TCP连接
+    - 所有报名请求完成后才发布报名结果事件（邮件等由事件订阅者处理）
+    - 配置了retry时，名额被抢的活动交给ApplyRetry重试，重试结束后再发布结果
+    - 记录从检测到发出报名请求、收到响应的延迟
+    """
+
+    def __init__(self, monitor, max_workers=8, warm_connections=4, warm_interval=30, latency_log=None):
+        """
+        Args:
+            monitor: ActivityMonitor实例，提供transport、request_governor、_request、_post_apply和_publish_apply_result
+            max_workers: 并发报名请求数
+            warm_connections: 预热时同时建立的连接数
+            warm_interval: 两次预热之间的间隔（秒），应小于服务器的keep-alive超时时间
+            latency_log: 延迟记录的CSV文件路径，None表示只保存在内存中
+        """
+        self.monitor = monitor
+        self.max_workers = max_workers
+        self.warm_connections = warm_connections
+        self.warm_interval = warm_interval
+
+        self.post_latency = LatencyTracker('detect_to_post', log_file=latency_log)
+        self.response_latency = LatencyTracker('detect_to_response', log_file=latency_log)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='apply')
+        self._warm_executor = ThreadPoolExecutor(max_workers=warm_connections, thread_name_prefix='apply-warm')
+        self._last_warm = 0
+        self.retry = None  # ApplyRetry，由ActivityMonitor按配置设置
+
+    def dispatch(self, activities, detected_at=None):
+        """
+        并发报名，全部请求完成后发布报名结果事件
+
+        Args:
+            activities: 待报名的活动列表
+            detected_at: 检测到活动时的time.perf_counter()值
+
+        Returns:
+            list: 每个已发送请求的(activity, 是否成功, 错误信息, HTTP状态码)
+        """
+        if not activities:
+            return []
+
+        if detected_at is None:
+            detected_at = time.perf_counter()
+
+        futures = [self._executor.submit(self._apply_one, activity, detected_at) for activity in activities]
+        wait(futures)
+
+        results = [f.result() for f in futures if f.result() is not None]
+        if not results:
+            return results
+
+        summary = self.response_latency.summary()
+        transport = self.monitor.transport.stats()
+        reuse_rate = transport['reuse_rate'] or 0
+        logging.info(f"本轮发出 {len(results)} 个报名请求，检测到响应延迟 "
+                     f"p50={summary['p50_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms，"
+                     f"连接复用率 {reuse_rate:.1%}（握手 {transport['handshakes']} 次）")
+        if self.monitor.request_governor is not None:
+            budget = self.monitor.request_governor.stats()
+            logging.info(f"请求预算使用率 {budget['utilization']:.1%}，当前速率 {budget['current_rate']:.1f}/s，"
+                         f"剩余额度 {budget['tokens']:.1f}")
+
+        for result in results:
+            self.finish(result)
+        return results
+
+    def finish(self, result):
+        """处理一个报名结果：可重试的失败交给retry（已在重试中的活动由retry发布结果），其余直接发布结果事件"""
+        activity, success, error_data, status_code = result
+        if not success and self.retry is not None and self.retry.submit(activity, status_code, error_data):
+            return
+        self.monitor._publish_apply_result(activity, success, error_data)
+
+    def keep_warm(self):
+        """距离上次预热超过warm_interval时，重新预热连接池"""
+        if time.monotonic() - self._last_warm >= self.warm_interval:
+            self.prewarm()
+
+    def prewarm(self):
+        """在后台并发发送轻量请求，在连接池中保留多个到API主机的长连接"""
+        self._last_warm = time.monotonic()
+        url = f"{self.monitor.base_url}/xuefenapi/applysign/"
+
+        for _ in range(self.warm_connections):
+            self._warm_executor.submit(self._ping, url)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self._warm_executor.shutdown(wait=True)
+        if self.retry is not None:
+            self.retry.shutdown()
+        self.post_latency.close()
+        self.response_latency.close()
+
+    def _apply_one(self, activity, detected_at):
+        activity_id = activity.get('id')
+        if self.monitor.applied_activities.get(activity_id):
+            return None
+        # 正在重试的活动由ApplyRetry继续报名，轮询再次检测到时不重复发出请求
+        if self.retry is not None and self.retry.is_retrying(activity_id):
+            return None
+
+        posted_at = time.perf_counter()
+        result = self.monitor._post_apply(activity)
+        responded_at = time.perf_counter()
+
+        # 报名请求发出后再记录延迟，不占用检测到发出请求之间的时间
+        self.post_latency.record(posted_at - detected_at, activity_id)
+        self.response_latency.record(responded_at - detected_at, activity_id)
+        return result
+
+    def _ping(self, url):
+        try:
+            # 预热优先级最低，没有空闲额度时跳过
+            self.monitor._request('HEAD', url, PAGE, budget_timeout=0, timeout=5)
+        except Exception as e:
+            logging.debug(f"预热连接失败: {e}")
@@ -0,0 +1,202 @@
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import Metrics
+
+APPLY_RETRY_TOTAL = Metrics.counter('apply_retry_total', '争抢名额重试的结果', ('outcome',))
+APPLY_RETRY_ATTEMPTS = Metrics.counter('apply_retry_attempts_total', '重试发出的报名请求数')
+
+RETRYABLE = 'retryable'
+TERMINAL = 'terminal'
+
+# 服务器繁忙或暂时不可用
+RETRYABLE_STATUS = frozenset((429, 500, 502, 503, 504))
+# 限流：只有知道何时可以恢复（Retry-After或RequestGovernor的暂停时间）时才重试，并等到那时
+RATE_LIMITED_STATUS = 429
+# 认证失败、活动不存在等，重试也不会成功
+TERMINAL_STATUS = frozenset((401, 403, 404))
+# 错误信息中的关键字，先匹配终止类
+TERMINAL_MESSAGES = ('已报名', '重复报名', '已结束', '已截止', '不在报名时间', '时间冲突', '没有权限', '不存在')
+RETRYABLE_MESSAGES = ('名额已满', '人数已满', '已满', '请稍后', '频繁', '繁忙')
+
+
+def classify_error(status_code, error_data):
+    """
+    判断一次失败的报名能否重试
+
+    Args:
+        status_code: HTTP状态码
+        error_data: 服务器返回的错误信息
+
+    Returns:
+        str: RETRYABLE或TERMINAL；无法识别的错误按TERMINAL处理
+    """
+    if status_code in RETRYABLE_STATUS:
+        return RETRYABLE
+    if status_code in TERMINAL_STATUS:
+        return TERMINAL
+
+    text = error_data if isinstance(error_data, str) else json.dumps(error_data, ensure_ascii=False)
+    if any(message in text for message in TERMINAL_MESSAGES):
+        return TERMINAL
+    if any(message in text for message in RETRYABLE_MESSAGES):
+        return RETRYABLE
+    return TERMINAL
+
+
+class ApplyRetry:
+    """
+    争抢名额时的短时重试
+
+    名额刚释放就被别人抢走时，报名会以"名额已满"失败。对这类可重试的失败，在一个很短的时间窗口内
+    以带抖动的间隔继续报名：轮询看到活动仍接近满员时按间隔重试，看到明显有余量时立即重试，
+    活动不再是报名中时停止。每个活动的请求数和时间都有上限，同时重试的活动数量受线程数限制，
+    不会对服务器造成大量请求。
+
+    服务器返回Retry-After或RequestGovernor处于暂停中时，等到暂停结束再发下一次请求，超出时间窗口则停止；
+    被限流（429）但不知道何时恢复时不重试。
+
+    重试结束后才发布最终的报名结果事件，失败邮件只发一次。
+    """
+
+    def __init__(self, monitor, max_attempts=10, window=10, base_delay=0.3, jitter=0.5, near_full_slots=2,
+                 max_workers=4):
+        """
+        Args:
+            monitor: ActivityMonitor实例
+            max_attempts: 每个活动最多发出的报名请求数（含第一次）
+            window: 每个活动的重试时间窗口（秒）
+            base_delay: 两次重试之间的基础间隔（秒）
+            jitter: 间隔的随机抖动比例
+            near_full_slots: 余量不超过该值时视为仍在争抢，按间隔重试
+            max_workers: 同时重试的活动数量
+        """
+        self.monitor = monitor
+        self.max_attempts = max_attempts
+        self.window = window
+        self.base_delay = base_delay
+        self.jitter = jitter
+        self.near_full_slots = near_full_slots
+
+        # 正在重试的活动ID -> 轮询看到的最新状态(used_capacity, capacity, status)，None表示还没有新数据
+        self._views = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='apply-retry')
+
+    @property
+    def active(self):
+        """是否有正在重试的活动"""
+        return bool(self._views)
+
+    def is_retrying(self, activity_id):
+        """该活动是否正在重试，重试期间不应再由ApplyDispatcher发出报名请求"""
+        return activity_id in self._views
+
+    def submit(self, activity, status_code, error_data):
+        """
+        对一次失败的报名开始重试
+
+        Returns:
+            bool: 报名结果是否由重试负责发布：开始重试或该活动已在重试中时返回True，
+                错误不可重试时返回False，由调用方发布结果
+        """
+        activity_id = activity['id']
+        with self._lock:
+            if activity_id in self._views:
+                # 已有重试在进行，结果由它在结束时发布，避免重复的失败通知
+                return True
+            if self.max_attempts <= 1 or classify_error(status_code, error_data) != RETRYABLE:
+                return False
+            if status_code == RATE_LIMITED_STATUS and self._blocked_for() <= 0:
+                return False
+            self._views[activity_id] = None
+
+        logging.info(f"名额被抢，开始重试: {activity.get('name')} (ID: {activity_id})")
+        self._executor.submit(self._run, activity, error_data)
+        return True
+
+    def observe(self, activities):
+        """用本次轮询结果更新正在重试的活动的状态"""
+        views = self._views
+        if not views:
+            return
+
+        with self._lock:
+            for activity in activities:
+                activity_id = activity['id']
+                if activity_id in views:
+                    views[activity_id] = (activity['used_capacity'], activity['capacity'], activity['status'])
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _blocked_for(self):
+        """服务器要求暂停的剩余秒数：报名响应的Retry-After与RequestGovernor暂停时间中较晚的一个"""
+        blocked = self.monitor.apply_blocked_until - time.monotonic()
+        governor = self.monitor.request_governor
+        if governor is not None:
+            blocked = max(blocked, governor.blocked_until - governor.clock())
+        return blocked
+
+    def _next_delay(self, view):
+        if view is not None and view[1] - view[0] > self.near_full_slots:
+            return 0
+        return self.base_delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self, activity, error_data):
+        monitor = self.monitor
+        activity_id = activity['id']
+        deadline = time.monotonic() + self.window
+        attempts = 1
+        success = False
+        outcome = 'exhausted'
+
+        try:
+            while attempts < self.max_attempts and time.monotonic() < deadline:
+                view = self._views.get(activity_id)
+                if view is not None and view[2] != '报名中':
+                    outcome = 'closed'
+                    break
+
+                # 服务器要求暂停时等到暂停结束，来不及在时间窗口内恢复时放弃
+                blocked = self._blocked_for()
+                if blocked > 0:
+                    if time.monotonic() + blocked >= deadline:
+                        outcome = 'throttled'
+                        break
+                    time.sleep(blocked)
+                else:
+                    delay = self._next_delay(view)
+                    if delay:
+                        time.sleep(delay)
+
+                if monitor.applied_activities.get(activity_id):
+                    outcome = 'applied_elsewhere'
+                    return
+
+                attempts += 1
+                APPLY_RETRY_ATTEMPTS.inc()
+                result = monitor._post_apply(activity)
+                if result is None:
+                    continue  # 网络错误，继续重试
+
+                _, success, error_data, status_code = result
+                if success:
+                    outcome = 'success'
+                    break
+                if classify_error(status_code, error_data) != RETRYABLE:
+                    outcome = 'terminal'
+                    break
+                if status_code == RATE_LIMITED_STATUS and self._blocked_for() <= 0:
+                    outcome = 'throttled'
+                    break
+        finally:
+            with self._lock:
+                self._views.pop(activity_id, None)
+            APPLY_RETRY_TOTAL.inc(labels=(outcome,))
+
+        logging.info(f"重试结束（{outcome}，共 {attempts} 次请求）: {activity.get('name')} (ID: {activity_id})")
+        monitor._publish_apply_result(activity, success, error_data)
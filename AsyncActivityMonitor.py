@@ -0,0 +1,182 @@
+import asyncio
+import time
+import logging
+from ActivityMonitor import ActivityMonitor
+
+
+class AsyncActivityMonitor(ActivityMonitor):
+    """
+    基于asyncio的活动监控器
+
+    轮询、报名和token刷新分别运行在独立的任务中，邮件等通知由事件总线的订阅者线程处理，
+    阻塞的网络请求通过线程池执行，轮询节奏不会被慢速I/O拖慢。
+    检测逻辑与ActivityMonitor.check_new_activity完全一致。
+    """
+
+    def __init__(self, base_url, tokenfile, sno, smtp_config=None, check_interval=2,
+                 token_check_interval=60, **kwargs):
+        """
+        初始化异步活动监控器
+
+        Args:
+            base_url: API基础URL
+            tokenfile: token存放文件名
+            sno: 学号
+            smtp_config: SMTP服务器配置字典
+            check_interval: 检查间隔时间（秒）
+            token_check_interval: 检查token是否需要刷新的间隔（秒）
+            kwargs: 其余参数传给ActivityMonitor
+        """
+        super().__init__(base_url, tokenfile, sno, smtp_config=smtp_config, check_interval=check_interval,
+                         **kwargs)
+
+        self.token_check_interval = token_check_interval
+
+        self._apply_queue = None
+        self._stop_event = None
+        self._wake_event = None
+        self._loop = None
+
+    async def run(self):
+        """
+        启动所有任务，直到调用stop()为止
+
+        任一任务因异常退出时停止其余任务，并把该异常抛给调用方
+        """
+        self._apply_queue = asyncio.Queue()
+        self._stop_event = asyncio.Event()
+        self._wake_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+        logging.info("开始异步监控活动名额...")
+
+        tasks = [
+            asyncio.create_task(self._poll_task(), name='poll'),
+            asyncio.create_task(self._apply_task(), name='apply'),
+            asyncio.create_task(self._token_task(), name='token'),
+        ]
+        stop_waiter = asyncio.create_task(self._stop_event.wait(), name='stop')
+
+        try:
+            # 各任务都不会自行结束，除了调用stop()以外，只有任务抛出异常时才会返回
+            done, _ = await asyncio.wait([stop_waiter, *tasks], return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task in done and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            stop_waiter.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logging.info("异步监控已停止")
+
+    def stop(self):
+        """请求停止所有任务，可以从其他线程调用"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    def submit_control(self, command):
+        """提交一个控制命令，并唤醒正在等待下一次轮询的轮询任务，可以从其他线程调用"""
+        future = super().submit_control(command)
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake_event.set)
+            except RuntimeError:
+                pass  # 事件循环已结束，命令不会被执行，调用方等待超时
+        return future
+
+    def monitor_loop(self, raise_on_error=False):
+        """
+        主监控循环（异步版本）
+
+        Args:
+            raise_on_error: 任务发生未处理的异常时是否在记录日志后重新抛出，由Supervisor使用；
+                False时记录日志后返回
+        """
+        print("🚀 活动名额监控器已启动（异步模式）")
+        print(f"📊 每{self.check_interval}秒检查一次活动名额")
+        print("⏸️  按 Ctrl+C 停止监控\n")
+
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logging.info("监控器被用户中断")
+            print("\n👋 监控已停止")
+        except Exception as e:
+            logging.error(f"监控循环发生错误: {e}")
+            if raise_on_error:
+                raise
+
+    async def _poll_task(self):
+        """按调度器给出的节奏轮询活动列表，检测到的活动交给报名任务"""
+        while True:
+            # 控制命令在轮询之间执行，一次轮询中使用的配置不会变化
+            self._apply_control_changes()
+
+            data = await asyncio.to_thread(self.fetch_all_activities)
+            detected_at = time.perf_counter()
+
+            if data and 'results' in data:
+                activities = data['results']
+                self.scheduler.record_success()
+                logging.info(f"检测到 {len(activities)} 个活动 (总计: {data.get('count', 0)})", extra={'rate_limited': True})
+
+                # 内容与上次轮询完全相同时跳过比较
+                if not self.last_fetch_unchanged:
+                    self.scheduler.observe(activities)
+                    can_applies = self.check_new_activity(activities)
+                    if self.apply_paused and can_applies:
+                        logging.info(f"报名已暂停，跳过 {len(can_applies)} 个可报名活动", extra={'rate_limited': True})
+                        can_applies = []
+                    for activity in self.select_activities(can_applies):
+                        self._apply_queue.put_nowait((activity, detected_at))
+            else:
+                logging.error("获取活动数据失败或数据格式不正确")
+                self.scheduler.record_error(self.last_error_status)
+
+            # 预热在后台线程中进行，不阻塞轮询
+            self.apply_dispatcher.keep_warm()
+
+            await self._wait_next_poll()
+
+    async def _wait_next_poll(self):
+        """
+        等待到调度器给出的下一个截止时间，与PollScheduler.wait相同：
+        等待期间收到的控制命令立即执行，命令调用poll_now()时立即开始下一次轮询
+        """
+        scheduler = self.scheduler
+        # 调度器按绝对时间计算下一次轮询，错过的周期直接跳过
+        scheduler.next_delay()
+        while True:
+            remaining = scheduler.next_deadline - scheduler.clock()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+            self._wake_event.clear()
+            self._apply_control_changes()
+
+    async def _apply_task(self):
+        """每个待报名活动都在独立的任务中发出报名请求"""
+        pending = set()
+
+        while True:
+            activity, detected_at = await self._apply_queue.get()
+            task = asyncio.create_task(self._apply_one(activity, detected_at))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    async def _apply_one(self, activity, detected_at):
+        result = await asyncio.to_thread(self.apply_dispatcher._apply_one, activity, detected_at)
+
+        if result is not None:
+            self.apply_dispatcher.finish(result)
+
+    async def _token_task(self):
+        """定期检查token是否需要刷新，刷新本身在后台线程中进行"""
+        while True:
+            await asyncio.sleep(self.token_check_interval)
+            self.start_token_refresh()
@@ -0,0 +1,201 @@
+from array import array
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # 没有numpy时退化为逐项比较
+    np = None
+
+STATUS_UNTRACKED = 0
+STATUS_OPEN = 1
+
+_get_id = itemgetter('id')
+_get_capacity = itemgetter('capacity')
+_get_used = itemgetter('used_capacity')
+_get_status = itemgetter('status')
+
+
+class CapacitySnapshot:
+    """
+    列式活动容量快照
+
+    以活动ID映射到槽位，用capacity、used_capacity、status三个平行数组保存上一次轮询的状态。
+    每次轮询把新数据整体与快照比较，得出"变为可报名"的活动，结果与
+    ActivityMonitor.check_new_activity一致：
+    - 首次出现且有余量的报名中活动
+    - 之前已满、现在有余量的报名中活动
+    非报名中的活动会从快照中移除，本次未出现的活动保持原状态。
+    同一次轮询中重复出现的活动按出现顺序依次比较。
+
+    安装了numpy时比较是向量化的，否则使用标准库array逐项比较。
+    """
+
+    def __init__(self, size=1024):
+        """
+        Args:
+            size: 初始槽位数量，不足时自动扩容
+        """
+        self._index = {}
+        self._size = 0
+        self._allocate(size)
+
+        # 最近一次diff中写入快照和从快照移除的活动ID，供持久化使用
+        self.last_updated = []
+        self.last_removed = []
+        # 最近一次diff中首次出现就有余量的活动ID
+        self.last_opened = []
+
+    def __len__(self):
+        """当前跟踪的报名中活动数量"""
+        if np is not None:
+            return int((self.status[:self._size] == STATUS_OPEN).sum())
+        return sum(1 for i in range(self._size) if self.status[i] == STATUS_OPEN)
+
+    def diff(self, activities):
+        """
+        用本次轮询结果更新快照，返回变为可报名的活动
+
+        Args:
+            activities: 活动列表
+
+        Returns:
+            list: 变为可报名的活动
+        """
+        if not activities:
+            self.last_updated, self.last_removed, self.last_opened = [], [], []
+            return []
+
+        # 逐列取出比较所需的字段，不为每个活动创建中间对象
+        ids = list(map(_get_id, activities))
+        capacity = list(map(_get_capacity, activities))
+        used = list(map(_get_used, activities))
+        is_open = [status == '报名中' for status in map(_get_status, activities)]
+
+        slots = list(map(self._index.get, ids))
+        if None in slots:
+            slots = [self._slot(activity_id) if slot is None else slot for activity_id, slot in zip(ids, slots)]
+
+        if np is not None:
+            hits, opened, updated, removed = self._diff_numpy(slots, capacity, used, is_open)
+        else:
+            hits, opened, updated, removed = self._diff_python(slots, capacity, used, is_open)
+
+        self.last_updated = [ids[i] for i in updated]
+        self.last_removed = [ids[i] for i in removed]
+        self.last_opened = [ids[i] for i in opened]
+        return [activities[i] for i in hits]
+
+    def get(self, activity_id):
+        """返回跟踪中活动的{'used_capacity', 'capacity'}，未跟踪时返回None"""
+        slot = self._index.get(activity_id)
+        if slot is None or self.status[slot] != STATUS_OPEN:
+            return None
+        return {'used_capacity': int(self.used[slot]), 'capacity': int(self.capacity[slot])}
+
+    def items(self):
+        """以{活动ID: {'used_capacity', 'capacity'}}形式导出跟踪中的活动"""
+        return {
+            activity_id: {'used_capacity': int(self.used[slot]), 'capacity': int(self.capacity[slot])}
+            for activity_id, slot in self._index.items()
+            if self.status[slot] == STATUS_OPEN
+        }
+
+    def load(self, previous_activities):
+        """
+        从check_new_activity使用的缓存字典恢复快照
+
+        Args:
+            previous_activities: {活动ID: {'used_capacity', 'capacity', ...}}
+        """
+        for activity_id, state in previous_activities.items():
+            slot = self._slot(activity_id)
+            self.capacity[slot] = state['capacity']
+            self.used[slot] = state['used_capacity']
+            self.status[slot] = STATUS_OPEN
+
+    def _diff_numpy(self, slots, capacity, used, is_open):
+        slots = np.asarray(slots, dtype=np.int64)
+        if np.bincount(slots).max() > 1:
+            # 同一次轮询中有重复的活动（翻页期间列表发生了移动），向量化比较会把每次出现都与旧快照比较；
+            # 按出现顺序逐个比较，后一次出现看到前一次的更新，与字典实现一致
+            return self._diff_python(slots.tolist(), capacity, used, is_open)
+
+        capacity = np.asarray(capacity, dtype=np.int64)
+        used = np.asarray(used, dtype=np.int64)
+        is_open = np.asarray(is_open, dtype=bool)
+
+        tracked = self.status[slots] == STATUS_OPEN
+        was_available = self.used[slots] < self.capacity[slots]
+        available = used < capacity
+
+        hits = is_open & available & (~tracked | ~was_available)
+        opened = hits & ~tracked
+
+        # 只在"有无余量"发生变化或首次出现时写入，与字典实现的缓存更新时机一致
+        update = is_open & (~tracked | (available != was_available))
+        removed = ~is_open & tracked
+        self.capacity[slots[update]] = capacity[update]
+        self.used[slots[update]] = used[update]
+        self.status[slots[update]] = STATUS_OPEN
+        self.status[slots[~is_open]] = STATUS_UNTRACKED
+
+        return (np.flatnonzero(hits).tolist(), np.flatnonzero(opened).tolist(),
+                np.flatnonzero(update).tolist(), np.flatnonzero(removed).tolist())
+
+    def _diff_python(self, slots, capacity, used, is_open):
+        hits = []
+        opened = []
+        updated = []
+        removed = []
+        for i, slot in enumerate(slots):
+            tracked = self.status[slot] == STATUS_OPEN
+
+            if not is_open[i]:
+                if tracked:
+                    removed.append(i)
+                self.status[slot] = STATUS_UNTRACKED
+                continue
+
+            was_available = self.used[slot] < self.capacity[slot]
+            available = used[i] < capacity[i]
+
+            if available and (not tracked or not was_available):
+                hits.append(i)
+                if not tracked:
+                    opened.append(i)
+
+            if not tracked or available != was_available:
+                updated.append(i)
+                self.capacity[slot] = capacity[i]
+                self.used[slot] = used[i]
+                self.status[slot] = STATUS_OPEN
+
+        return hits, opened, updated, removed
+
+    def _slot(self, activity_id):
+        slot = self._index.get(activity_id)
+        if slot is None:
+            slot = len(self._index)
+            if slot >= self._size:
+                self._allocate(self._size * 2)
+            self._index[activity_id] = slot
+        return slot
+
+    def _allocate(self, size):
+        """分配或扩容平行数组，保留已有数据"""
+        if np is not None:
+            capacity = np.zeros(size, dtype=np.int64)
+            used = np.zeros(size, dtype=np.int64)
+            status = np.zeros(size, dtype=np.int8)
+            if self._size:
+                capacity[:self._size] = self.capacity
+                used[:self._size] = self.used
+                status[:self._size] = self.status
+        else:
+            extra = size - self._size
+            capacity = (self.capacity if self._size else array('q')) + array('q', [0]) * extra
+            used = (self.used if self._size else array('q')) + array('q', [0]) * extra
+            status = (self.status if self._size else array('b')) + array('b', [0]) * extra
+
+        self.capacity, self.used, self.status = capacity, used, status
+        self._size = size
@@ -0,0 +1,206 @@
+import os
+import hmac
+import json
+import socket
+import logging
+import threading
+import socketserver
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """
+    本地控制接口
+
+    在本机HTTP端口或Unix socket上接收控制命令，不需要修改Main.py重启，内存中的状态和token都会保留：
+
+        GET  /status       监控器状态
+        GET  /activities   跟踪中的活动和已报名活动ID
+        POST /poll         立即轮询一次
+        POST /interval     修改轮询间隔，请求体为{"interval": 5}
+        POST /pause        暂停自动报名（仍然轮询）
+        POST /resume       恢复自动报名
+        POST /reload       重新加载配置，请求体为配置字典，为空时读取config_file
+
+    所有命令（包括查询）都通过ActivityMonitor.submit_control交给监控循环，在两次轮询之间执行，
+    一次轮询不会看到修改了一半的配置。
+
+    浏览器中的网页也能向本机端口发请求，因此：
+    - 带Origin头的请求一律拒绝（浏览器发出的跨站请求都带Origin，curl等工具不带）
+    - POST必须带Content-Type: application/json，包括没有请求体的/poll、/pause等，
+      网页表单无法不经预检发出这样的请求
+    - 设置了token时，所有请求都需要带X-Control-Token头
+    例如：
+
+        curl -X POST -H 'Content-Type: application/json' -d '{"interval": 1}' http://127.0.0.1:9109/interval
+        curl --unix-socket control.sock http://localhost/status
+    """
+
+    def __init__(self, monitor, port=None, host='127.0.0.1', socket_path=None, timeout=30, token=None):
+        """
+        Args:
+            monitor: ActivityMonitor实例
+            port: 监听的HTTP端口，0表示自动分配，None表示不监听端口
+            host: 监听地址，默认只监听本机
+            socket_path: Unix socket路径，已存在时先删除，None表示不使用
+            timeout: 等待监控循环执行命令的最长时间（秒）
+            token: 共享口令，设置后请求需要带X-Control-Token头，None表示不检查
+        """
+        if port is None and not socket_path:
+            raise ValueError("需要指定port或socket_path")
+
+        self.monitor = monitor
+        self.timeout = timeout
+        self.socket_path = socket_path
+        self.token = token
+        self._servers = []
+        self._threads = []
+
+        handler = self._make_handler()
+        if port is not None:
+            httpd = ThreadingHTTPServer((host, port), handler)
+            httpd.daemon_threads = True
+            self._servers.append(httpd)
+
+        if socket_path:
+            if not hasattr(socket, 'AF_UNIX'):
+                raise RuntimeError("当前平台不支持Unix socket")
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self._servers.append(_UnixHTTPServer(socket_path, handler))
+
+    @property
+    def port(self):
+        """监听的HTTP端口，没有监听端口时为None"""
+        for server in self._servers:
+            if isinstance(server.server_address, tuple):
+                return server.server_address[1]
+        return None
+
+    def start(self):
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever, name='control-server', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        addresses = []
+        if self.port is not None:
+            addresses.append(f"http://{self._servers[0].server_address[0]}:{self.port}")
+        if self.socket_path:
+            addresses.append(self.socket_path)
+        logging.info(f"控制接口已启动: {', '.join(addresses)}")
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def handle(self, method, path, body):
+        """
+        执行一个控制命令
+
+        Returns:
+            tuple: (HTTP状态码, 响应字典)
+        """
+        monitor = self.monitor
+        routes = {
+            ('GET', '/status'): lambda: monitor.inspect(),
+            ('GET', '/activities'): lambda: monitor.inspect(include_activities=True),
+            ('POST', '/poll'): monitor.poll_now,
+            ('POST', '/pause'): lambda: monitor.set_apply_paused(True),
+            ('POST', '/resume'): lambda: monitor.set_apply_paused(False),
+            ('POST', '/interval'): lambda: monitor.set_check_interval((body or {}).get('interval')),
+            ('POST', '/reload'): lambda: monitor.reload_config(body or None),
+        }
+
+        command = routes.get((method, path))
+        if command is None:
+            return 404, {'ok': False, 'error': f"未知的命令: {method} {path}"}
+
+        future = monitor.submit_control(command)
+        try:
+            result = future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return 503, {'ok': False, 'error': f"监控循环未在{self.timeout}秒内执行命令，可能没有运行"}
+        except (ValueError, TypeError) as e:
+            return 400, {'ok': False, 'error': str(e)}
+        except Exception as e:
+            logging.error(f"执行控制命令 {method} {path} 失败: {e}")
+            return 500, {'ok': False, 'error': str(e)}
+
+        if method == 'POST':
+            logging.info(f"已执行控制命令: {path}")
+        return 200, {'ok': True, 'result': result}
+
+    def check_request(self, method, headers):
+        """
+        检查请求是否来自本机的命令行工具或脚本
+
+        Returns:
+            tuple: 拒绝时返回(HTTP状态码, 响应字典)，允许时返回None
+        """
+        if headers.get('Origin') is not None:
+            return 403, {'ok': False, 'error': "不接受来自浏览器页面的请求"}
+
+        if self.token is not None:
+            provided = headers.get('X-Control-Token') or ''
+            if not hmac.compare_digest(provided.encode('utf-8'), self.token.encode('utf-8')):
+                return 401, {'ok': False, 'error': "缺少或错误的X-Control-Token"}
+
+        if method == 'POST':
+            content_type = (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+            if content_type != 'application/json':
+                return 415, {'ok': False, 'error': "POST请求需要Content-Type: application/json"}
+
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def _dispatch(self, method):
+                rejected = server.check_request(method, self.headers)
+                if rejected is not None:
+                    self._reply(*rejected)
+                    return
+
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw.strip() else None
+                except ValueError as e:
+                    self._reply(400, {'ok': False, 'error': f"请求体不是有效的JSON: {e}"})
+                    return
+                if body is not None and not isinstance(body, dict):
+                    self._reply(400, {'ok': False, 'error': "请求体必须是JSON对象"})
+                    return
+
+                self._reply(*server.handle(method, self.path.split('?')[0].rstrip('/'), body))
+
+            def _reply(self, status, data):
+                payload = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -1,53 +1,167 @@
-import requests
 import time
-import json
-from datetime import datetime
 import logging
 import smtplib
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from email.header import Header
 import threading
 import ssl
+import queue
+import atexit
+import Metrics
+from Metrics import LatencyTracker
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('activity_monitor.log'),
-        logging.StreamHandler()
-    ]
-)
-
+EMAIL_SEND_SECONDS = Metrics.histogram('email_send_seconds', '单次SMTP发送耗时')
+EMAIL_SENT_TOTAL = Metrics.counter('email_sent_total', '邮件发送次数', ('result',))
 
 class EmailNotifier:
-    """邮件通知器"""
+    """邮件通知器
+
+    send_email只把邮件放入有界队列并立即返回，由后台线程保持一个已登录的SMTP连接发送，
+    连接断开时自动重连，发送失败时按指数退避重试。
+    """
 
-    def __init__(self, smtp_config):
+    def __init__(self, smtp_config, queue_size=100, max_retries=3, retry_backoff=2, idle_timeout=60):
         """
         初始化邮件配置
 
         Args:
             smtp_config: SMTP服务器配置字典
+            queue_size: 待发送队列的最大长度
+            max_retries: 单封邮件的最大重试次数
+            retry_backoff: 首次重试前的等待时间（秒），之后每次翻倍
+            idle_timeout: 连接空闲超过该时间（秒）后主动断开，避免被服务器关闭
         """
         self.smtp_config = smtp_config
         self.last_sent_time = {}  # 记录每个活动的最后发送时间，避免重复发送
 
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.server = None
+
+        # 发送统计
+        self.send_latency = LatencyTracker('email_send')  # 单次SMTP发送耗时
+        self.delivery_latency = LatencyTracker('email_delivery')  # 入队到发送成功的耗时
+        self.sent_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+
+        self._closed = False
+        self._worker = threading.Thread(target=self._worker_loop, name='email-worker', daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self):
+        """当前待发送的邮件数量"""
+        return self.queue.qsize()
+
     def send_email(self, subject, html_content):
+        """
+        将邮件放入发送队列，立即返回
+
+        Returns:
+            bool: 是否成功入队
+        """
+        if self._closed:
+            logging.error(f"邮件通知器已关闭，丢弃邮件: {subject}")
+            return False
+
         try:
             recipient = self.smtp_config.get('recipient')
-            # 发送邮件
-            self._send_single_email(recipient, subject, html_content)
+            self.queue.put_nowait((recipient, subject, html_content, time.perf_counter()))
             return True
 
-        except Exception as e:
-            logging.error(f"发送邮件时发生错误: {e}")
+        except queue.Full:
+            self.dropped_count += 1
+            logging.error(f"邮件队列已满，丢弃邮件: {subject}")
             return False
 
+    def close(self, timeout=30):
+        """
+        停止后台线程，等待队列中的邮件发送完毕后断开连接
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self.queue.put(None)
+        self._worker.join(timeout)
+
+        if self._worker.is_alive():
+            logging.warning(f"邮件队列未在{timeout}秒内发送完毕，剩余 {self.queue_depth} 封")
+
+    def _worker_loop(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # 长时间没有邮件，主动断开连接
+                self._disconnect()
+                continue
+
+            if item is None:
+                self._disconnect()
+                return
+
+            recipient, subject, html_content, queued_at = item
+            self._deliver(recipient, subject, html_content, queued_at)
+
+    def _deliver(self, recipient, subject, html_content, queued_at):
+        """发送单封邮件，失败时按指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                logging.warning(f"邮件发送失败，{delay}秒后第{attempt}次重试: {subject}")
+                time.sleep(delay)
+
+            started_at = time.perf_counter()
+            sent = self._send_single_email(recipient, subject, html_content)
+            EMAIL_SEND_SECONDS.observe(time.perf_counter() - started_at)
+            EMAIL_SENT_TOTAL.inc(labels=('success' if sent else 'failure',))
+
+            if sent:
+                self.send_latency.record(time.perf_counter() - started_at)
+                self.delivery_latency.record(time.perf_counter() - queued_at)
+                self.sent_count += 1
+                return True
+
+        self.failed_count += 1
+        logging.error(f"邮件重试{self.max_retries}次后仍发送失败: {subject}")
+        return False
+
+    def _connect(self):
+        """建立SMTP连接并登录"""
+        context = ssl.create_default_context()
+        server = smtplib.SMTP_SSL(
+            self.smtp_config['smtp_server'],
+            self.smtp_config['smtp_port'],
+            context=context,
+            timeout=30
+        )
+
+        server.login(self.smtp_config['sender_email'], self.smtp_config['password'])
+        self.server = server
+
+    def _disconnect(self):
+        """安全关闭连接"""
+        server, self.server = self.server, None
+        if server:
+            try:
+                server.quit()  # 优雅关闭
+            except:
+                try:
+                    server.close()  # 强制关闭
+                except:
+                    pass  # 忽略所有关闭异常
+
     def _send_single_email(self, recipient, subject, html_content):
-        """发送单封邮件 - 忽略QUIT异常版本"""
-        server = None
+        """通过保持的连接发送单封邮件，连接不可用时重新连接"""
         try:
             # 创建简单邮件
             message = MIMEText(html_content, 'html', 'utf-8')
@@ -56,19 +170,12 @@ class EmailNotifier:
             message['Subject'] = Header(subject, 'utf-8')
 
             # 连接SMTP
-            context = ssl.create_default_context()
-            server = smtplib.SMTP_SSL(
-                self.smtp_config['smtp_server'],
-                self.smtp_config['smtp_port'],
-                context=context,
-                timeout=30
-            )
-
-            server.login(self.smtp_config['sender_email'], self.smtp_config['password'])
+            if self.server is None:
+                self._connect()
 
             # 发送邮件
             text = message.as_string()
-            server.sendmail(self.smtp_config['sender_email'], [recipient], text)
+            self.server.sendmail(self.smtp_config['sender_email'], [recipient], text)
 
             logging.info(f"邮件成功发送给: {recipient}")
             return True
@@ -80,23 +187,15 @@ class EmailNotifier:
                 return True
             else:
                 logging.error(f"SMTP数据错误: {e}")
+                self._disconnect()
                 return False
 
         except smtplib.SMTPException as e:
             logging.error(f"SMTP错误: {e}")
+            self._disconnect()
             return False
 
         except Exception as e:
             logging.error(f"发送邮件时发生错误: {e}")
+            self._disconnect()
             return False
-
-        finally:
-            # 安全关闭连接
-            if server:
-                try:
-                    server.quit()  # 优雅关闭
-                except:
-                    try:
-                        server.close()  # 强制关闭
-                    except:
-                        pass  # 忽略所有关闭异常
\ No newline at end of file
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import queue
+import socket
+import atexit
+import logging
+import threading
+import Metrics
+
+EVENTS_PUBLISHED_TOTAL = Metrics.counter('events_published_total', '发布的事件数', ('type',))
+EVENTS_DROPPED_TOTAL = Metrics.counter('events_dropped_total', '订阅者队列已满而丢弃的事件数', ('subscriber',))
+EVENT_HANDLER_SECONDS = Metrics.histogram('event_handler_seconds', '订阅者处理单个事件的耗时', ('subscriber',))
+
+
+class Event:
+    """事件基类，type为事件类型名，timestamp为事件发生的time.time()"""
+
+    type = 'event'
+
+    def __init__(self, sno=None):
+        self.sno = sno
+        self.timestamp = time.time()
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return {'type': self.type, 'timestamp': self.timestamp, 'sno': self.sno}
+
+
+class ActivityEvent(Event):
+    """与某个活动有关的事件"""
+
+    def __init__(self, activity, sno=None):
+        super().__init__(sno)
+        self.activity = activity
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['activity'] = dict(self.activity)
+        return data
+
+
+class ActivityOpened(ActivityEvent):
+    """首次出现就有余量的报名中活动"""
+
+    type = 'activity_opened'
+
+
+class SlotFreed(ActivityEvent):
+    """之前已满、现在有余量的报名中活动"""
+
+    type = 'slot_freed'
+
+
+class ApplySucceeded(ActivityEvent):
+    """报名成功"""
+
+    type = 'apply_succeeded'
+
+
+class ApplyFailed(ActivityEvent):
+    """报名请求被服务器拒绝，error为服务器返回的错误信息"""
+
+    type = 'apply_failed'
+
+    def __init__(self, activity, error, sno=None):
+        super().__init__(activity, sno)
+        self.error = error
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['error'] = self.error
+        return data
+
+
+class TokenRefreshed(Event):
+    """后台刷新token成功，exp为新token的过期时间"""
+
+    type = 'token_refreshed'
+
+    def __init__(self, exp, sno=None):
+        super().__init__(sno)
+        self.exp = exp
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['exp'] = self.exp
+        return data
+
+
+class Subscription:
+    """
+    一个订阅者
+
+    拥有独立的有界队列和处理线程，处理慢或出错只影响它自己；队列满时丢弃新事件。
+    """
+
+    def __init__(self, handler, event_types=None, name=None, queue_size=1000):
+        """
+        Args:
+            handler: 处理函数，参数为事件
+            event_types: 关心的事件类型名集合，None表示全部
+            name: 订阅者名称，用于日志和指标
+            queue_size: 队列长度
+        """
+        self.handler = handler
+        self.event_types = frozenset(event_types) if event_types else None
+        self.name = name or getattr(handler, '__name__', type(handler).__name__)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped_count = 0
+
+        self._thread = threading.Thread(target=self._run, name=f'event-{self.name}', daemon=True)
+        self._thread.start()
+
+    def wants(self, event):
+        return self.event_types is None or event.type in self.event_types
+
+    def offer(self, event):
+        """放入队列，立即返回"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped_count += 1
+            EVENTS_DROPPED_TOTAL.inc(labels=(self.name,))
+            logging.warning(f"事件订阅者 {self.name} 队列已满，丢弃事件 {event.type}")
+
+    def close(self, timeout=10):
+        """处理完队列中已有的事件后停止"""
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+        close = getattr(self.handler, 'close', None)
+        if close:
+            close()
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                self.handler(event)
+            except Exception as e:
+                logging.error(f"事件订阅者 {self.name} 处理 {event.type} 失败: {e}")
+            EVENT_HANDLER_SECONDS.observe(time.perf_counter() - started, labels=(self.name,))
+
+
+class EventBus:
+    """
+    进程内事件总线
+
+    publish只把事件放入各订阅者的队列，不等待处理，可以在轮询和报名线程中直接调用。
+    """
+
+    def __init__(self):
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def subscribe(self, handler, event_types=None, name=None, queue_size=1000):
+        """
+        注册订阅者
+
+        Args:
+            handler: 处理函数，参数为事件；有close方法时在总线关闭时调用
+            event_types: 关心的事件类型名，None表示全部
+            name: 订阅者名称
+            queue_size: 订阅者队列长度
+
+        Returns:
+            Subscription: 订阅对象，可用于unsubscribe
+        """
+        subscription = Subscription(handler, event_types, name, queue_size)
+        with self._lock:
+            # 复制后替换，publish遍历时无需加锁
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription, timeout=10):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+        subscription.close(timeout)
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, event):
+        """把事件分发给所有关心该类型的订阅者，立即返回"""
+        EVENTS_PUBLISHED_TOTAL.inc(labels=(event.type,))
+        for subscription in self._subscriptions:
+            if subscription.wants(event):
+                subscription.offer(event)
+
+    def close(self, timeout=10):
+        """依次关闭所有订阅者"""
+        if self._closed:
+            return
+
+        self._closed = True
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, []
+        for subscription in subscriptions:
+            subscription.close(timeout)
+
+
+class EmailSink:
+    """把报名结果转换为邮件，邮件内容由ActivityMonitor生成，发送由EmailNotifier完成"""
+
+    event_types = (ApplySucceeded.type, ApplyFailed.type)
+
+    def __init__(self, monitor):
+        """
+        Args:
+            monitor: 配置了email_notifier的ActivityMonitor
+        """
+        self.monitor = monitor
+
+    def __call__(self, event):
+        # 多账号时其他账号的事件会转发到这里，只通知本账号的报名结果
+        if event.sno is not None and event.sno != self.monitor.sno:
+            return
+        if event.type == ApplySucceeded.type:
+            self.monitor._notify_apply_result(event.activity, True, None)
+        elif event.type == ApplyFailed.type:
+            self.monitor._notify_apply_result(event.activity, False, event.error)
+
+
+class JsonlSink:
+    """把事件逐行写入JSONL文件"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 文件路径，已存在时追加
+        """
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, event):
+        self._file.write(json.dumps(event.to_dict(), ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class UnixSocketSink:
+    """
+    在本地Unix socket上广播事件
+
+    每个连接上来的客户端都会收到之后的全部事件（每行一个JSON），例如
+    socat - UNIX-CONNECT:events.sock
+    发送超时或断开的客户端会被移除。
+    """
+
+    def __init__(self, path, send_timeout=1.0):
+        """
+        Args:
+            path: socket文件路径，已存在时先删除
+            send_timeout: 向单个客户端发送的超时时间（秒）
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError("当前平台不支持Unix socket")
+
+        self.path = path
+        self.send_timeout = send_timeout
+        self._clients = []
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            os.remove(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen()
+
+        self._accept_thread = threading.Thread(target=self._accept_loop, name='event-socket', daemon=True)
+        self._accept_thread.start()
+
+    def __call__(self, event):
+        line = (json.dumps(event.to_dict(), ensure_ascii=False) + '\n').encode('utf-8')
+
+        with self._lock:
+            clients = list(self._clients)
+
+        for client in clients:
+            try:
+                client.sendall(line)
+            except OSError:
+                self._remove(client)
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return  # 已关闭
+
+            client.settimeout(self.send_timeout)
+            with self._lock:
+                self._clients.append(client)
+
+    def _remove(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+        client.close()
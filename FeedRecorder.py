@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import zlib
+import queue
+import atexit
+import struct
+import logging
+import argparse
+import tempfile
+import threading
+
+import jwt
+import requests
+
+# 每条记录：时间戳(double) 页码 每页数量 状态码 压缩后长度；长度为0表示与该分页上一条记录内容相同
+FRAME_HEADER = struct.Struct('<dIIHI')
+
+
+class FeedRecorder:
+    """
+    活动列表原始响应记录器
+
+    把fetch_activities收到的每个原始响应连同时间戳追加写入文件。响应体用zlib压缩，
+    与同一分页上一条内容相同时只写一个空记录。写文件在后台线程中进行。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 记录文件路径，已存在时追加
+        """
+        self.path = path
+        self._queue = queue.Queue()
+        self._last_body = {}
+        self._closed = False
+
+        self._writer = threading.Thread(target=self._writer_loop, name='feed-recorder', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, page, limit, status, body, timestamp=None):
+        """
+        记录一个响应
+
+        Args:
+            page: 页码
+            limit: 每页数量
+            status: HTTP状态码
+            body: 原始响应体（bytes）
+            timestamp: 收到响应的时间，默认为当前时间
+        """
+        self._queue.put((timestamp or time.time(), page, limit, status, body))
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _writer_loop(self):
+        with open(self.path, 'ab') as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+
+                timestamp, page, limit, status, body = item
+                key = (page, limit)
+                if body and self._last_body.get(key) == body:
+                    payload = b''
+                else:
+                    payload = zlib.compress(body) if body else b''
+                    if body:
+                        self._last_body[key] = body
+
+                f.write(FRAME_HEADER.pack(timestamp, page, limit, status, len(payload)))
+                f.write(payload)
+
+                if self._queue.empty():
+                    f.flush()
+
+
+def read_recording(path):
+    """
+    逐条读取记录文件
+
+    Yields:
+        tuple: (时间戳, 页码, 每页数量, 状态码, 原始响应体)
+    """
+    last_body = {}
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+
+            timestamp, page, limit, status, length = FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+
+            key = (page, limit)
+            if length:
+                body = zlib.decompress(payload)
+                last_body[key] = body
+            else:
+                body = last_body.get(key, b'')
+
+            yield timestamp, page, limit, status, body
+
+
+def group_polls(frames):
+    """以第1页为分界，把记录划分为一次次轮询：[(时间戳, {(页码, 每页数量): (状态码, 响应体)})]"""
+    polls = []
+    for timestamp, page, limit, status, body in frames:
+        if page == 1 or not polls:
+            polls.append((timestamp, {}))
+        polls[-1][1][(page, limit)] = (status, body)
+    return polls
+
+
+class ReplayResponse:
+    """最小化的requests.Response替身"""
+
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} (replay)", response=self)
+
+
+class ReplaySession:
+    """
+    回放用的session替身
+
+    GET活动列表时返回当前轮询记录的响应；报名请求按apply_status直接返回，不访问网络。
+    """
+
+    def __init__(self, apply_status=201):
+        self.headers = {}
+        self.apply_status = apply_status
+        self.current = {}
+        self.posts = []
+
+        data = {} if apply_status // 100 == 2 else {'non_field_errors': ['名额已满']}
+        self._apply_body = json.dumps(data).encode('utf-8')
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def request(self, method, url, **kwargs):
+        """与requests.Session.request相同的入口，ActivityMonitor的请求都经过这里，按方法分发"""
+        handlers = {'GET': self.get, 'POST': self.post, 'HEAD': self.head}
+        handler = handlers.get(method.upper())
+        if handler is None:
+            return ReplayResponse(405, b'{}')
+        return handler(url, **kwargs)
+
+    def get(self, url, params=None, headers=None, timeout=None, **kwargs):
+        key = (int(params['page']), int(params['limit']))
+        if key not in self.current:
+            return ReplayResponse(404, b'{}')
+        status, body = self.current[key]
+        return ReplayResponse(status, body)
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        self.posts.append((time.time(), json))
+        return ReplayResponse(self.apply_status, self._apply_body)
+
+    def head(self, url, timeout=None, **kwargs):
+        return ReplayResponse(200)
+
+
+class ReplayDriver:
+    """
+    把记录的活动列表重新送入check_new_activity和报名流程
+
+    speed为回放倍速（1表示按原始时间间隔，0表示不等待、尽快回放）。
+    """
+
+    def __init__(self, path, speed=0, monitor=None, apply_status=201):
+        """
+        Args:
+            path: 记录文件路径
+            speed: 回放倍速
+            monitor: 要驱动的ActivityMonitor，默认创建一个不需要真实token的实例
+            apply_status: 模拟的报名响应状态码
+        """
+        self.polls = group_polls(read_recording(path))
+        self.speed = speed
+        self.session = ReplaySession(apply_status)
+        self.monitor = monitor or self._make_monitor()
+        self.monitor.session = self.session
+
+        if self.polls:
+            self.monitor.page_size = min(limit for _, limit in self.polls[0][1])
+
+    def run(self):
+        """
+        回放全部记录
+
+        Returns:
+            dict: 回放的轮询数、检测到的可报名活动[(记录时间, 活动ID)]、发出的报名请求数和耗时
+        """
+        detections = []
+        started = time.perf_counter()
+        previous_timestamp = None
+
+        for timestamp, responses in self.polls:
+            if self.speed and previous_timestamp is not None:
+                time.sleep(max(0, timestamp - previous_timestamp) / self.speed)
+            previous_timestamp = timestamp
+
+            self.session.current = responses
+            data = self.monitor.fetch_all_activities()
+            if not data or 'results' not in data or self.monitor.last_fetch_unchanged:
+                continue
+
+            can_applies = self.monitor.check_new_activity(data['results'])
+            detections.extend((timestamp, activity['id']) for activity in can_applies)
+            self.monitor.apply_activities(can_applies)
+
+        return {
+            'polls': len(self.polls),
+            'detections': detections,
+            'apply_posts': len(self.session.posts),
+            'elapsed': time.perf_counter() - started,
+        }
+
+    @staticmethod
+    def _make_monitor():
+        from ActivityMonitor import ActivityMonitor
+
+        fd, tokenfile = tempfile.mkstemp(suffix='.cfg')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(jwt.encode({'exp': int(time.time()) + 365 * 24 * 3600}, 'replay-only-token-not-for-real-use',
+                               algorithm='HS256'))
+        try:
+            return ActivityMonitor('http://replay.invalid', tokenfile, 'replay')
+        finally:
+            os.remove(tokenfile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放活动列表记录')
+    parser.add_argument('path', help='记录文件路径')
+    parser.add_argument('--speed', type=float, default=0, help='回放倍速，0表示尽快回放')
+    parser.add_argument('--apply-status', type=int, default=201, help='模拟的报名响应状态码')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    result = ReplayDriver(args.path, speed=args.speed, apply_status=args.apply_status).run()
+
+    print(f"回放 {result['polls']} 次轮询，耗时 {result['elapsed']:.2f} 秒，发出 {result['apply_posts']} 个报名请求")
+    for timestamp, activity_id in result['detections']:
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))} 可报名: {activity_id}")
+
+
+if __name__ == '__main__':
+    main()
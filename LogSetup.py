@@ -0,0 +1,203 @@
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_router = None
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RateLimiter:
+    """
+    按调用位置限流
+
+    只限制带有extra={'rate_limited': True}的日志，例如每次轮询都会输出的"检测到 N 个活动"；
+    报名、邮件、token等日志不受影响。
+    每个调用位置（文件+行号）一个令牌桶：最多连续输出burst条，之后每interval秒恢复一条。
+    被限流的条数会附加在该位置下一条输出的日志后面。
+    """
+
+    def __init__(self, interval=10, burst=5):
+        """
+        Args:
+            interval: 恢复一条额度所需的时间（秒）
+            burst: 令牌桶容量
+        """
+        self.interval = interval
+        self.burst = burst
+        self._buckets = {}  # (文件, 行号) -> [剩余额度, 上次更新时间, 被限流条数]
+        self._lock = threading.Lock()
+
+    def allow(self, record):
+        """
+        Returns:
+            int: 允许输出时返回此前被限流的条数（>=0），不允许时返回-1；没有标记rate_limited的日志总是返回0
+        """
+        if not getattr(record, 'rate_limited', False):
+            return 0
+
+        key = (record.pathname, record.lineno)
+        now = record.created
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) / self.interval)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return -1
+
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+            return suppressed
+
+
+class _DropQueueHandler(QueueHandler):
+    """队列满时丢弃日志并计数，不阻塞调用线程"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogRouter(logging.Handler):
+    """
+    根日志处理器
+
+    WARNING及以上的日志在调用线程中直接写入各处理器，不限流；
+    以下级别的日志放入队列，由后台线程写入，其中标记了rate_limited的日志先经过限流。
+    """
+
+    def __init__(self, handlers, rate_limiter=None, queue_size=10000):
+        super().__init__()
+        self.handlers = handlers
+        self.rate_limiter = rate_limiter
+        self._closed = False
+
+        self.queue_handler = _DropQueueHandler(queue.Queue(maxsize=queue_size))
+        self.listener = QueueListener(self.queue_handler.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    @property
+    def dropped(self):
+        return self.queue_handler.dropped
+
+    def emit(self, record):
+        if record.levelno >= logging.WARNING:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+
+        if self.rate_limiter is not None:
+            suppressed = self.rate_limiter.allow(record)
+            if suppressed < 0:
+                return
+            if suppressed:
+                record.msg = f"{record.getMessage()}（此处另有 {suppressed} 条日志被限流）"
+                record.args = None
+
+        self.queue_handler.handle(record)
+
+    def close(self):
+        # atexit中shutdown_logging和logging.shutdown都会调用
+        if self._closed:
+            return
+        self._closed = True
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+def setup_logging(log_file='activity_monitor.log', level=logging.INFO, max_bytes=10 * 1024 * 1024,
+                  backup_count=5, when=None, json_format=False, console=True, rate_limit=10, rate_burst=5):
+    """
+    配置全局日志
+
+    Args:
+        log_file: 日志文件路径，None表示不写文件
+        level: 最低日志级别
+        max_bytes: 单个日志文件的最大字节数，超过后轮转（when为None时生效）
+        backup_count: 保留的历史日志文件数量
+        when: 按时间轮转的周期，例如'midnight'，None表示按大小轮转
+        json_format: 日志文件是否使用每行一个JSON的格式
+        console: 是否同时输出到控制台
+        rate_limit: 同一位置标记了rate_limited、低于WARNING的日志每隔多少秒恢复一条额度，0表示不限流
+        rate_burst: 同一位置允许连续输出的条数
+
+    Returns:
+        LogRouter: 根日志处理器
+    """
+    global _router
+
+    handlers = []
+    if log_file:
+        if when:
+            file_handler = TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count,
+                                                    encoding='utf-8')
+        else:
+            file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                               encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+        handlers.append(file_handler)
+
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(stream_handler)
+
+    rate_limiter = RateLimiter(rate_limit, rate_burst) if rate_limit > 0 else None
+    router = LogRouter(handlers, rate_limiter)
+
+    root = logging.getLogger()
+    if _router is not None:
+        root.removeHandler(_router)
+        _router.close()
+    root.addHandler(router)
+    root.setLevel(level)
+
+    _router = router
+    return router
+
+
+def shutdown_logging():
+    """写完队列中剩余的日志"""
+    global _router
+
+    if _router is not None:
+        logging.getLogger().removeHandler(_router)
+        _router.close()
+        _router = None
+
+
+atexit.register(shutdown_logging)
@@ -1,6 +1,15 @@
 from ActivityMonitor import ActivityMonitor
+from LogSetup import setup_logging
+from Supervisor import Supervisor
 
 if __name__ == '__main__':
+    # 为True时在子进程中运行监控器，发生未处理的错误后自动重启，状态保存在state_学号.db中
+    SUPERVISED = False
+
+    # 日志写入activity_monitor.log（超过10MB轮转）并输出到控制台，json_format=True输出JSON格式
+    # 守护模式下activity_monitor.log由监控子进程写入，守护进程的日志写入supervisor.log
+    setup_logging('supervisor.log' if SUPERVISED else 'activity_monitor.log')
+
     # 配置信息 - 请根据实际情况修改
     BASE_URL = "http://yjszhsy.bjtu.edu.cn"  # 基础URL
     tokenfile = 'token.cfg'  # token存放文件名，一般不用改
@@ -12,8 +21,11 @@ if __name__ == '__main__':
         'password': 'abc123',  # 邮箱授权码（不是登录密码）
         'recipient': '123456@qq.com'  # 收件人邮箱（还是你的邮箱）
     }
-    # 创建监控器实例（每2秒检查一次）
-    monitor = ActivityMonitor(BASE_URL, tokenfile, sno, smtp_config=SMTP_CONFIG, check_interval=5)
+    if SUPERVISED:
+        Supervisor(BASE_URL, tokenfile, sno, smtp_config=SMTP_CONFIG, check_interval=5).run()
+    else:
+        # 创建监控器实例（每2秒检查一次）
+        monitor = ActivityMonitor(BASE_URL, tokenfile, sno, smtp_config=SMTP_CONFIG, check_interval=5)
 
-    # 开始监控
-    monitor.monitor_loop()
\ No newline at end of file
+        # 开始监控
+        monitor.monitor_loop()
\ No newline at end of file
@@ -0,0 +1,271 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class LatencyTracker:
+    """
+    延迟记录器
+
+    在内存中保留最近的样本用于计算分位数，并可追加写入CSV文件，便于长期跟踪。
+    写文件在后台线程中进行，record不做磁盘I/O。
+    """
+
+    def __init__(self, name, maxlen=10000, log_file=None):
+        """
+        Args:
+            name: 指标名称
+            maxlen: 内存中保留的样本数量
+            log_file: 追加写入的CSV文件路径，None表示不写文件
+        """
+        self.name = name
+        self.samples = deque(maxlen=maxlen)
+        self.log_file = log_file
+        self.lock = threading.Lock()
+        self.count = 0
+
+        self._queue = None
+        self._closed = False
+        if log_file:
+            if not os.path.isfile(log_file):
+                with open(log_file, 'w', encoding='utf-8') as f:
+                    f.write('timestamp,metric,label,seconds\n')
+
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, name=f'latency-{name}', daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def record(self, seconds, label=''):
+        """
+        记录一个样本
+
+        Args:
+            seconds: 延迟（秒）
+            label: 附加标签，例如活动ID
+        """
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+        if self._queue is not None:
+            self._queue.put(f"{time.time():.3f},{self.name},{label},{seconds:.6f}\n")
+
+    def close(self):
+        """写完已记录的样本后停止写文件"""
+        if self._queue is None or self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _writer_loop(self):
+        # 行缓冲：每行一次追加写入，多个记录器写同一个文件时行不会交错
+        with open(self.log_file, 'a', encoding='utf-8', buffering=1) as f:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    return
+                f.write(line)
+
+    def percentile(self, p):
+        """返回最近样本的p分位数（秒），没有样本时返回None"""
+        with self.lock:
+            ordered = sorted(self.samples)
+
+        if not ordered:
+            return None
+
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def summary(self):
+        """返回样本数与p50/p99（毫秒）"""
+        p50 = self.percentile(50)
+        p99 = self.percentile(99)
+        return {
+            'count': self.count,
+            'p50_ms': None if p50 is None else p50 * 1000,
+            'p99_ms': None if p99 is None else p99 * 1000,
+        }
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Counter:
+    """单调递增的计数器，可按标签值分别计数"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, value=1, labels=()):
+        """
+        Args:
+            value: 增加量
+            labels: 与labelnames一一对应的标签值
+        """
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """按固定分桶统计耗时分布的直方图"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}  # 标签值 -> [各分桶计数, 总和, 样本数]
+
+    def observe(self, seconds, labels=()):
+        """
+        Args:
+            seconds: 观测值（秒）
+            labels: 与labelnames一一对应的标签值
+        """
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((labels, (list(counts), total, count))
+                           for labels, (counts, total, count) in self.series.items())
+
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def render(self):
+        """以Prometheus文本格式输出所有指标"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    """在全局注册表中获取或创建计数器"""
+    return REGISTRY.register(Counter, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """在全局注册表中获取或创建直方图"""
+    return REGISTRY.register(Histogram, name, documentation, labelnames, buckets)
+
+
+class MetricsServer:
+    """
+    本地指标HTTP服务
+
+    在后台线程中以Prometheus文本格式提供/metrics
+    """
+
+    def __init__(self, port=9108, host='127.0.0.1', registry=REGISTRY):
+        """
+        Args:
+            port: 监听端口，0表示自动分配
+            host: 监听地址，默认只监听本机
+            registry: 指标注册表
+        """
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        logging.info(f"指标服务已启动: http://{self.httpd.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
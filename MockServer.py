@@ -0,0 +1,334 @@
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def make_activity(activity_id, capacity=10, used_capacity=10, status='报名中'):
+    """构造一个与xuefenapi返回格式一致的活动字典"""
+    return {
+        'id': activity_id,
+        'name': f'测试活动{activity_id}',
+        'status': status,
+        'capacity': capacity,
+        'used_capacity': used_capacity,
+        'start_time': '2025-11-20T14:00:00+08:00',
+        'end_time': '2025-11-20T16:00:00+08:00',
+        'address': '思源楼101',
+        'college_txt': '计算机学院',
+        'category_txts': ['学术讲座'],
+    }
+
+
+def make_catalogue(count, closed_ratio=0.2, seed=0):
+    """
+    生成一个大型活动目录：报名中的活动全部满员，部分活动为已结束
+
+    Args:
+        count: 活动数量
+        closed_ratio: 非报名中活动的比例
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    activities = []
+    for activity_id in range(1, count + 1):
+        capacity = rng.randint(10, 200)
+        status = '已结束' if rng.random() < closed_ratio else '报名中'
+        activities.append(make_activity(activity_id, capacity=capacity, used_capacity=capacity, status=status))
+    return activities
+
+
+class MockXuefenServer:
+    """
+    本地模拟的xuefenapi服务
+
+    提供/xuefenapi/activity/（分页）和/xuefenapi/applysign/两个接口，
+    用于在不访问学校服务器的情况下测试和压测监控器。支持：
+    - 脚本化的名额变化（script/open_slot/fill）
+    - 固定或随机的响应延迟、按比例返回错误
+    - 可选的ETag条件请求
+    - /__mock__/stats 返回每次名额开放到收到报名的时间，供其他进程读取
+    """
+
+    def __init__(self, activities=None, host='127.0.0.1', port=0, latency=0, error_rate=0,
+                 error_status=500, etag=False, seed=None):
+        """
+        Args:
+            activities: 初始活动列表
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            latency: 每个请求的额外延迟（秒），可以是(最小值, 最大值)
+            error_rate: 返回错误的概率
+            error_status: 返回错误时的状态码
+            etag: 是否为活动列表返回ETag并支持304
+            seed: 随机种子
+        """
+        self.lock = threading.Lock()
+        self.activities = {a['id']: a for a in (activities or [])}
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.etag = etag
+        self.rng = random.Random(seed)
+
+        # 名额开放事件：{'id', 'opened_at', 'applied_at'}，时间为time.time()，可跨进程比较
+        self.open_events = []
+        self.apply_requests = []
+        self.request_counts = {}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+        self._script_thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def add_activity(self, activity):
+        with self.lock:
+            self.activities[activity['id']] = activity
+
+    def open_slot(self, activity_id, slots=1):
+        """释放指定活动的名额，并记录开放时间"""
+        with self.lock:
+            activity = self.activities[activity_id]
+            activity['used_capacity'] = max(0, activity['capacity'] - slots)
+            self.open_events.append({'id': activity_id, 'opened_at': time.time(), 'applied_at': None})
+
+    def fill(self, activity_id):
+        """把指定活动的名额占满"""
+        with self.lock:
+            activity = self.activities[activity_id]
+            activity['used_capacity'] = activity['capacity']
+
+    def set_status(self, activity_id, status):
+        with self.lock:
+            self.activities[activity_id]['status'] = status
+
+    def open_random_slot(self):
+        """随机选择一个已满的报名中活动释放一个名额，返回活动ID"""
+        with self.lock:
+            candidates = [a['id'] for a in self.activities.values()
+                          if a['status'] == '报名中' and a['used_capacity'] >= a['capacity']]
+        if not candidates:
+            return None
+
+        activity_id = self.rng.choice(candidates)
+        self.open_slot(activity_id)
+        return activity_id
+
+    def script(self, events):
+        """
+        在后台按时间执行名额变化脚本
+
+        Args:
+            events: [{'at': 相对开始的秒数, 'action': 'open'|'fill'|'status'|'open_random', 'id', 'slots', 'status'}]
+        """
+        def run():
+            started = time.monotonic()
+            for event in sorted(events, key=lambda e: e['at']):
+                delay = event['at'] - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+                action = event['action']
+                if action == 'open':
+                    self.open_slot(event['id'], event.get('slots', 1))
+                elif action == 'fill':
+                    self.fill(event['id'])
+                elif action == 'status':
+                    self.set_status(event['id'], event['status'])
+                elif action == 'open_random':
+                    self.open_random_slot()
+
+        self._script_thread = threading.Thread(target=run, daemon=True)
+        self._script_thread.start()
+
+    def latencies(self):
+        """返回每个已被报名的开放事件从开放到收到报名请求的延迟（秒）"""
+        with self.lock:
+            return [e['applied_at'] - e['opened_at'] for e in self.open_events if e['applied_at'] is not None]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'open_events': [dict(e) for e in self.open_events],
+                'request_counts': dict(self.request_counts),
+                'apply_requests': len(self.apply_requests),
+            }
+
+    def list_page(self, page, limit):
+        with self.lock:
+            ordered = sorted(self.activities.values(), key=lambda a: a['id'], reverse=True)
+            start = (page - 1) * limit
+            results = [dict(a) for a in ordered[start:start + limit]]
+            return {'count': len(ordered), 'results': results}
+
+    def apply(self, payload):
+        """处理报名请求，返回(状态码, 响应体)"""
+        now = time.time()
+        with self.lock:
+            activity_id = payload.get('activity')
+            self.apply_requests.append((activity_id, now))
+            activity = self.activities.get(activity_id)
+
+            if activity is None:
+                return 404, {'detail': '活动不存在'}
+            if activity['used_capacity'] >= activity['capacity']:
+                return 400, {'non_field_errors': ['名额已满']}
+
+            activity['used_capacity'] += 1
+            for event in reversed(self.open_events):
+                if event['id'] == activity_id:
+                    if event['applied_at'] is None:
+                        event['applied_at'] = now
+                    break
+            return 201, {'activity': activity_id, 'student': payload.get('student')}
+
+    def _before_request(self, path):
+        """计数、模拟延迟，按概率返回错误状态码"""
+        with self.lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = self.rng.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.rstrip('/')
+
+                if path == '/__mock__/stats':
+                    return self._reply(200, server.stats())
+                if path != '/xuefenapi/activity':
+                    return self._reply(404, {'detail': 'Not found.'})
+
+                error = server._before_request(path)
+                if error:
+                    return self._reply(error, {'detail': '服务器错误'})
+
+                query = parse_qs(parsed.query)
+                page = int(query.get('page', ['1'])[0])
+                limit = int(query.get('limit', ['10'])[0])
+                body = self._encode(server.list_page(page, limit))
+
+                headers = {}
+                if server.etag:
+                    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    headers['ETag'] = etag
+
+                self._send(200, body, headers)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length) if length else b'{}'
+                path = urlparse(self.path).path.rstrip('/')
+
+                if path != '/xuefenapi/applysign':
+                    return self._reply(404, {'detail': 'Not found.'})
+
+                error = server._before_request(path)
+                if error:
+                    return self._reply(error, {'detail': '服务器错误'})
+
+                status, data = server.apply(json.loads(body))
+                self._reply(status, data)
+
+            def _encode(self, data):
+                return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+            def _reply(self, status, data):
+                self._send(status, self._encode(data))
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug("mock server: " + format % args)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟的xuefenapi服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--activities', type=int, default=100, help='活动数量')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的额外延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回500的概率')
+    parser.add_argument('--etag', action='store_true', help='为活动列表返回ETag')
+    parser.add_argument('--open-every', type=float, default=0, help='每隔多少秒随机释放一个名额，0表示不释放')
+    parser.add_argument('--script', help='名额变化脚本（JSON文件，格式见MockXuefenServer.script）')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockXuefenServer(make_catalogue(args.activities, seed=args.seed), host=args.host, port=args.port,
+                              latency=args.latency, error_rate=args.error_rate, etag=args.etag,
+                              seed=args.seed).start()
+
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            server.script(json.load(f))
+
+    # 第一行输出地址，便于其他进程读取自动分配的端口
+    print(server.base_url, flush=True)
+
+    try:
+        while True:
+            if args.open_every > 0:
+                time.sleep(args.open_every)
+                server.open_random_slot()
+            else:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
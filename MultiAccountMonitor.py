@@ -0,0 +1,258 @@
+import time
+import queue
+import logging
+import threading
+from ActivityMonitor import ActivityMonitor
+from RequestGovernor import RequestGovernor
+from EventBus import ApplySucceeded, ApplyFailed, TokenRefreshed
+
+POLLER_ONLY_OPTIONS = ('control_port', 'control_socket', 'config_file', 'control_token', 'metrics_port',
+                       'record_feed', 'latency_log', 'event_log', 'event_socket')
+
+# 只有负责轮询的账号会检测活动，其他账号只产生报名结果和token刷新事件
+FORWARDED_EVENTS = (ApplySucceeded.type, ApplyFailed.type, TokenRefreshed.type)
+
+
+class AccountWorker:
+    """
+    单个账号的报名线程
+
+    每个账号拥有独立的ActivityMonitor（token、session、报名记录、邮件通知），
+    在自己的线程中报名，其他账号的报名不会影响它的延迟。
+    """
+
+    def __init__(self, monitor, token_check_interval=60):
+        """
+        Args:
+            monitor: 该账号的ActivityMonitor
+            token_check_interval: 空闲时检查token是否需要刷新的间隔（秒）
+        """
+        self.monitor = monitor
+        self.token_check_interval = token_check_interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=f'account-{monitor.sno}', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, activities, detected_at):
+        self.queue.put((activities, detected_at))
+
+    def submit_control(self, command):
+        """
+        提交一个控制命令，在该账号的报名线程中两次报名之间执行
+
+        Returns:
+            Future: 命令的执行结果
+        """
+        future = self.monitor.submit_control(command)
+        future.add_done_callback(self._log_control_error)
+        # 唤醒等待中的报名线程
+        self.queue.put(())
+        return future
+
+    def _log_control_error(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"账号 {self.monitor.sno} 执行控制命令时发生错误: {future.exception()}")
+
+    def stop(self, timeout=30):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.token_check_interval)
+            except queue.Empty:
+                item = ()
+
+            if item is None:
+                return
+
+            self.monitor._apply_control_changes()
+
+            if item:
+                activities, detected_at = item
+                try:
+                    self.monitor.apply_activities(activities, detected_at)
+                except Exception as e:
+                    logging.error(f"账号 {self.monitor.sno} 报名时发生错误: {e}")
+
+            # 在后台刷新token，不阻塞该账号的报名
+            self.monitor.start_token_refresh()
+
+
+class MultiAccountMonitor:
+    """
+    多账号活动监控器
+
+    所有账号共享一次活动列表获取和比较（使用第一个账号的session），
+    检测到可报名活动后分发给每个账号的报名线程，各自使用自己的token和session报名。
+
+    控制接口由第一个账号启动，命令交给MultiAccountMonitor执行：暂停/恢复和报名规则对所有账号生效，
+    轮询间隔、邮件通知只修改第一个账号（其他账号保留各自的smtp_config）。
+    """
+
+    def __init__(self, base_url, accounts, check_interval=2, **kwargs):
+        """
+        Args:
+            base_url: API基础URL
+            accounts: 账号配置列表，每项为{'sno', 'tokenfile', 'smtp_config'(可选), 'state_db'(可选)}
+            check_interval: 检查间隔时间（秒）
+            kwargs: 其余参数传给每个账号的ActivityMonitor；request_budget由所有账号共享，
+                control_port、control_socket、config_file、control_token、metrics_port、record_feed、latency_log、
+                event_log和event_socket在进程内只能启动一次，只用于第一个账号（负责轮询的账号），
+                其他账号的报名结果和token刷新事件转发到第一个账号的事件总线
+        """
+        if not accounts:
+            raise ValueError("至少需要配置一个账号")
+
+        # 所有账号访问同一个API主机，共用一份请求预算
+        request_budget = kwargs.get('request_budget')
+        if request_budget and not isinstance(request_budget, RequestGovernor):
+            kwargs['request_budget'] = RequestGovernor(**(request_budget if isinstance(request_budget, dict) else {}))
+
+        # 监听端口、socket和写文件的功能每个进程只启动一次
+        poller_options = {key: kwargs.pop(key) for key in POLLER_ONLY_OPTIONS if key in kwargs}
+
+        self.monitors = [
+            ActivityMonitor(
+                base_url,
+                account['tokenfile'],
+                account['sno'],
+                smtp_config=account.get('smtp_config'),
+                check_interval=check_interval,
+                state_db=account.get('state_db'),
+                **(poller_options if index == 0 else {}),
+                **kwargs
+            )
+            for index, account in enumerate(accounts)
+        ]
+
+        # 第一个账号负责共享的轮询与比较
+        self.poller = self.monitors[0]
+
+        # 其他账号的事件写入第一个账号的事件日志和socket
+        if poller_options.get('event_log') or poller_options.get('event_socket'):
+            for monitor in self.monitors[1:]:
+                monitor.event_bus.subscribe(self.poller.event_bus.publish, FORWARDED_EVENTS, name='forward')
+        self.workers = [AccountWorker(monitor) for monitor in self.monitors]
+
+        # 控制命令需要作用到所有账号，而不只是负责轮询的账号
+        if self.poller.control_server is not None:
+            self.poller.control_server.monitor = self
+
+    def submit_control(self, command):
+        """控制命令由负责轮询的账号在两次轮询之间执行"""
+        return self.poller.submit_control(command)
+
+    def inspect(self, include_activities=False):
+        """返回负责轮询的账号的状态，accounts为其他账号的状态"""
+        status = self.poller.inspect(include_activities)
+        status['accounts'] = [monitor.inspect() for monitor in self.monitors[1:]]
+        return status
+
+    def poll_now(self):
+        self.poller.poll_now()
+
+    def set_check_interval(self, interval):
+        self.poller.set_check_interval(interval)
+
+    def set_apply_paused(self, paused):
+        """暂停或恢复所有账号的自动报名，已分发但还没开始的报名也会跳过"""
+        for monitor in self.monitors:
+            monitor.apply_paused = paused
+        logging.info("所有账号的自动报名已暂停" if paused else "所有账号的自动报名已恢复")
+
+    def reload_config(self, config=None):
+        """
+        重新加载配置，先由负责轮询的账号校验并应用，成功后把报名规则交给其他账号的报名线程替换
+
+        Args:
+            config: 配置字典，None表示读取第一个账号的config_file
+
+        Returns:
+            list: 已修改的配置项
+        """
+        if config is None:
+            config = self.poller.load_config_file()
+
+        changed = self.poller.reload_config(config)
+        if 'apply_rules' in changed:
+            apply_rules = config['apply_rules']
+            # 每个账号的ActivityFilter记录自己已报名的时间段，在各自的报名线程中替换，不会与报名同时修改
+            for worker in self.workers[1:]:
+                worker.submit_control(lambda monitor=worker.monitor: monitor.set_apply_rules(apply_rules))
+        return changed
+
+    def poll_once(self):
+        """
+        获取一次活动列表并把可报名的活动分发给所有账号
+
+        Returns:
+            list: 本次检测到的可报名活动，获取失败时返回None
+        """
+        poller = self.poller
+        data = poller.fetch_all_activities()
+        detected_at = time.perf_counter()
+
+        if not data or 'results' not in data:
+            logging.error("获取活动数据失败或数据格式不正确")
+            poller.scheduler.record_error(poller.last_error_status)
+            return None
+
+        activities = data['results']
+        poller.scheduler.record_success()
+        logging.info(f"检测到 {len(activities)} 个活动 (总计: {data.get('count', 0)})", extra={'rate_limited': True})
+
+        if poller.last_fetch_unchanged:
+            return []
+
+        poller.scheduler.observe(activities)
+        can_applies = poller.check_new_activity(activities)
+
+        # 其他账号不轮询，用共享的结果更新它们正在重试的活动状态
+        for monitor in self.monitors[1:]:
+            retry = monitor.apply_dispatcher.retry
+            if retry is not None and retry.active:
+                retry.observe(activities)
+
+        if can_applies and poller.apply_paused:
+            logging.info(f"报名已暂停，跳过 {len(can_applies)} 个可报名活动", extra={'rate_limited': True})
+        elif can_applies:
+            for worker in self.workers:
+                worker.submit(can_applies, detected_at)
+
+        return can_applies
+
+    def monitor_loop(self):
+        """
+        主监控循环
+        """
+        logging.info(f"开始监控活动名额，共 {len(self.monitors)} 个账号...")
+        print(f"🚀 活动名额监控器已启动（{len(self.monitors)} 个账号）")
+        print(f"📊 每{self.poller.check_interval}秒检查一次活动名额")
+        print("⏸️  按 Ctrl+C 停止监控\n")
+
+        for worker in self.workers:
+            worker.start()
+
+        try:
+            while True:
+                # 控制命令由负责轮询的账号在轮询之间执行
+                self.poller._apply_control_changes()
+                self.poll_once()
+
+                for monitor in self.monitors:
+                    monitor.apply_dispatcher.keep_warm()
+
+                self.poller.scheduler.wait(self.poller._apply_control_changes)
+
+        except KeyboardInterrupt:
+            logging.info("监控器被用户中断")
+            print("\n👋 监控已停止")
+        except Exception as e:
+            logging.error(f"监控循环发生错误: {e}")
+        finally:
+            for worker in self.workers:
+                worker.stop()
@@ -0,0 +1,186 @@
+import time
+import random
+import logging
+import threading
+
+
+class PollScheduler:
+    """
+    自适应轮询调度器
+
+    按绝对截止时间轮询，请求耗时不会累积成周期漂移。支持三种模式：
+    - normal: 常规间隔
+    - burst: 有活动即将满员或已报名人数刚发生变化时，使用短间隔
+    - backoff: 请求失败或服务器返回5xx时，按指数退避并加入随机抖动
+    """
+
+    NORMAL = 'normal'
+    BURST = 'burst'
+    BACKOFF = 'backoff'
+
+    def __init__(self, interval, burst_interval=0.5, burst_duration=30, near_full_slots=2,
+                 max_backoff=120, jitter=0.5, clock=time.monotonic):
+        """
+        Args:
+            interval: 常规轮询间隔（秒）
+            burst_interval: 突发模式轮询间隔（秒）
+            burst_duration: 已报名人数变化后保持突发模式的时间（秒）
+            near_full_slots: 剩余名额不超过该值时视为即将满员
+            max_backoff: 退避间隔上限（秒）
+            jitter: 退避抖动比例，实际间隔在[(1-jitter)*d, d]之间
+            clock: 单调时钟函数
+        """
+        self.interval = interval
+        self._burst_interval = burst_interval
+        self.burst_interval = min(burst_interval, interval)
+        self.burst_duration = burst_duration
+        self.near_full_slots = near_full_slots
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.clock = clock
+
+        self.mode = self.NORMAL
+        self.failures = 0
+        self.next_deadline = None
+
+        self._near_full = False
+        self._burst_until = 0
+        self._used_capacity = {}
+        self._wake = threading.Event()
+
+    def observe(self, activities):
+        """
+        根据本次轮询结果更新突发模式状态
+
+        Args:
+            activities: 活动列表
+        """
+        near_full = False
+        changed = False
+        used_capacity = {}
+
+        for activity in activities:
+            if activity['status'] != '报名中':
+                continue
+
+            activity_id = activity['id']
+            used = activity['used_capacity']
+            remaining = activity['capacity'] - used
+            used_capacity[activity_id] = used
+
+            if 0 < remaining <= self.near_full_slots:
+                near_full = True
+
+            previous = self._used_capacity.get(activity_id)
+            if previous is not None and previous != used:
+                changed = True
+
+        self._used_capacity = used_capacity
+        self._near_full = near_full
+        if changed:
+            self._burst_until = self.clock() + self.burst_duration
+
+        self._update_mode()
+
+    def record_success(self):
+        """记录一次成功的轮询，结束退避"""
+        self.failures = 0
+        self._update_mode()
+
+    def record_error(self, status_code=None):
+        """
+        记录一次失败的轮询
+
+        Args:
+            status_code: HTTP状态码（网络错误时为None）
+        """
+        self.failures += 1
+        self._update_mode(reason=f"状态码: {status_code}" if status_code else "请求失败")
+
+    def current_interval(self):
+        """当前模式下的轮询间隔（秒）"""
+        if self.mode == self.BACKOFF:
+            # 限制指数，长时间连续失败时浮点乘法不会溢出；2**30倍早已超过任何合理的max_backoff
+            delay = min(self.max_backoff, self.interval * (2 ** min(self.failures, 30)))
+            return delay * (1 - self.jitter * random.random())
+        if self.mode == self.BURST:
+            return self.burst_interval
+        return self.interval
+
+    def next_delay(self):
+        """
+        推进到下一个截止时间，并返回距离它的秒数
+
+        截止时间按绝对时间累加；若已落后（本次轮询耗时超过间隔），则从当前时间重新对齐。
+        """
+        self._update_mode()
+
+        now = self.clock()
+        if self.next_deadline is None:
+            self.next_deadline = now
+
+        self.next_deadline += self.current_interval()
+        if self.next_deadline < now:
+            self.next_deadline = now
+
+        return self.next_deadline - now
+
+    def wait(self, on_wake=None):
+        """
+        阻塞直到下一个轮询截止时间
+
+        Args:
+            on_wake: 被wake()提前唤醒时调用的函数；它调用poll_now()时立即返回，否则继续等待到截止时间
+        """
+        self.next_delay()
+        while True:
+            remaining = self.next_deadline - self.clock()
+            if remaining <= 0:
+                return
+            if self._wake.wait(remaining):
+                self._wake.clear()
+                if on_wake is not None:
+                    on_wake()
+
+    def wake(self):
+        """提前唤醒wait()，可以从其他线程调用"""
+        self._wake.set()
+
+    def poll_now(self):
+        """把下一个截止时间提前到当前时间"""
+        self.next_deadline = self.clock()
+
+    def set_interval(self, interval):
+        """
+        修改常规轮询间隔，间隔变短时下一个截止时间随之提前
+
+        Args:
+            interval: 常规轮询间隔（秒）
+        """
+        self.interval = interval
+        self.burst_interval = min(self._burst_interval, interval)
+        if self.next_deadline is not None:
+            self.next_deadline = min(self.next_deadline, self.clock() + self.current_interval())
+
+    def _update_mode(self, reason=None):
+        if self.failures > 0:
+            mode = self.BACKOFF
+        elif self._near_full or self.clock() < self._burst_until:
+            mode = self.BURST
+        else:
+            mode = self.NORMAL
+
+        if mode == self.mode:
+            return
+
+        if reason is None and self.mode == self.BACKOFF:
+            reason = "请求恢复正常"
+        elif reason is None:
+            reason = {
+                self.BURST: "有活动即将满员" if self._near_full else "已报名人数发生变化",
+                self.NORMAL: "活动状态平稳",
+                self.BACKOFF: "请求失败",
+            }[mode]
+
+        logging.info(f"轮询模式切换: {self.mode} -> {mode} ({reason})")
+        self.mode = mode
@@ -0,0 +1,225 @@
+import time
+import logging
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+import Metrics
+
+# 请求类别，数值越小优先级越高
+APPLY = 0  # 报名请求
+TOKEN = 1  # 刷新token
+POLL = 2  # 活动列表第一页
+PAGE = 3  # 其余分页、连接预热
+
+CLASS_NAMES = ('apply', 'token', 'poll', 'page')
+
+REQUEST_BUDGET_USED_TOTAL = Metrics.counter('request_budget_used_total', '按类别统计使用的请求额度', ('class',))
+REQUEST_BUDGET_WAIT_SECONDS = Metrics.histogram('request_budget_wait_seconds', '等待请求额度的时间', ('class',))
+REQUEST_THROTTLED_TOTAL = Metrics.counter('request_throttled_total', '服务器限流或变慢导致的降速次数', ('reason',))
+
+
+def parse_retry_after(value, now=None):
+    """
+    解析Retry-After响应头
+
+    Args:
+        value: 秒数或HTTP日期
+        now: 当前时间time.time()，用于计算HTTP日期距今的秒数
+
+    Returns:
+        float: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - (time.time() if now is None else now))
+
+
+class RequestGovernor:
+    """
+    API主机的请求预算
+
+    所有请求共享一个令牌桶，按类别排队：报名 > 刷新token > 轮询 > 分页。
+    - 报名请求不排队，也不等待Retry-After，额度不足时可以透支（最多burst个），由之后的轮询和分页偿还
+    - 轮询和分页只在剩余额度超过reserve时发出，保证报名随时有额度可用
+    - 同时等待时，高优先级类别先获得额度
+    - 服务器返回429（或带Retry-After的503）时，除报名外的请求暂停到Retry-After指定的时间，
+      没有该响应头时按指数退避；同时请求速率减半（每秒最多一次），之后每个正常响应逐步恢复
+    - 响应时间超过slow_threshold时同样减速，但不暂停
+    stats()返回最近window秒内的额度使用情况。
+    """
+
+    def __init__(self, rate=20, burst=40, reserve=4, min_rate=1, max_backoff=60, slow_threshold=3,
+                 window=60, clock=time.monotonic):
+        """
+        Args:
+            rate: 每秒恢复的请求额度
+            burst: 令牌桶容量，即允许的突发请求数
+            reserve: 为报名和认证检查保留的额度
+            min_rate: 减速的下限（每秒请求数）
+            max_backoff: 没有Retry-After时退避时间的上限（秒）
+            slow_threshold: 响应时间超过该值（秒）时视为服务器变慢，0表示不检查
+            window: stats()统计使用率的时间窗口（秒）
+            clock: 单调时钟函数
+        """
+        self.rate = rate
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self.min_rate = min(min_rate, rate)
+        self.max_backoff = max_backoff
+        self.slow_threshold = slow_threshold
+        self.window = window
+        self.clock = clock
+
+        self.current_rate = rate
+        self.blocked_until = 0
+        self.failures = 0  # 连续收到429的次数
+
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._waiting = [0] * len(CLASS_NAMES)
+        self._used = deque()  # (时间, 类别)，最近window秒内使用的额度
+        self._throttled = 0
+        self._slowed_at = None
+        self._cond = threading.Condition()
+
+    def acquire(self, priority, timeout=None):
+        """
+        获取一个请求额度，必要时等待
+
+        Args:
+            priority: 请求类别（APPLY、TOKEN、POLL、PAGE）
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否获得额度，超时返回False
+        """
+        started = self.clock()
+        deadline = None if timeout is None else started + timeout
+
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = self.clock()
+                    self._refill(now)
+                    delay = self._delay(priority, now)
+                    if delay <= 0:
+                        break
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        delay = min(delay, deadline - now)
+                    self._cond.wait(delay)
+
+                self._tokens -= 1
+                self._used.append((now, priority))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+        waited = now - started
+        REQUEST_BUDGET_USED_TOTAL.inc(labels=(CLASS_NAMES[priority],))
+        if waited > 0:
+            REQUEST_BUDGET_WAIT_SECONDS.observe(waited, labels=(CLASS_NAMES[priority],))
+        return True
+
+    def observe(self, status_code, headers=None, elapsed=None):
+        """
+        根据响应调整请求速率
+
+        Args:
+            status_code: HTTP状态码
+            headers: 响应头
+            elapsed: 响应时间（秒）
+        """
+        retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+
+        with self._cond:
+            now = self.clock()
+            self._refill(now)
+
+            if status_code == 429 or (status_code == 503 and retry_after is not None):
+                if retry_after is None:
+                    retry_after = min(self.max_backoff, 2 ** self.failures)
+                self.failures += 1
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self._slow_down(now)
+                reason = str(status_code)
+                logging.warning(f"服务器限流（状态码: {status_code}），{retry_after:.1f}秒内暂停非报名请求，"
+                                f"请求速率降至 {self.current_rate:.1f}/s")
+            elif self.slow_threshold and elapsed is not None and elapsed > self.slow_threshold:
+                self._slow_down(now)
+                reason = 'slow'
+                logging.warning(f"服务器响应变慢（{elapsed:.1f}秒），请求速率降至 {self.current_rate:.1f}/s")
+            else:
+                if status_code < 500:
+                    self.failures = 0
+                    if self.current_rate < self.rate:
+                        self.current_rate = min(self.rate, self.current_rate + self.rate / 20)
+                return
+
+            self._throttled += 1
+            self._cond.notify_all()
+
+        REQUEST_THROTTLED_TOTAL.inc(labels=(reason,))
+
+    def stats(self):
+        """
+        Returns:
+            dict: 当前速率、剩余额度、最近window秒的使用率及各类别用量、排队数、剩余暂停时间、降速次数
+        """
+        with self._cond:
+            now = self.clock()
+            self._refill(now)
+            used = [0] * len(CLASS_NAMES)
+            for _, priority in self._used:
+                used[priority] += 1
+            return {
+                'rate': self.rate,
+                'current_rate': self.current_rate,
+                'tokens': self._tokens,
+                'utilization': len(self._used) / (self.rate * self.window),
+                'used': dict(zip(CLASS_NAMES, used)),
+                'waiting': dict(zip(CLASS_NAMES, self._waiting)),
+                'paused_for': max(0.0, self.blocked_until - now),
+                'throttled': self._throttled,
+            }
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.current_rate)
+        self._updated = now
+
+        cutoff = now - self.window
+        used = self._used
+        while used and used[0][0] < cutoff:
+            used.popleft()
+
+    def _delay(self, priority, now):
+        """距离该类别可以获得额度还需等待的秒数，<=0表示可以立即获得"""
+        if priority == APPLY:
+            # 透支上限为burst
+            return (-self.burst + 1 - self._tokens) / self.current_rate
+
+        if any(self._waiting[:priority]):
+            # 等待高优先级请求先获得额度，它们完成后会唤醒
+            return max(self.blocked_until - now, 1 / self.current_rate)
+
+        need = 1 if priority == TOKEN else 1 + self.reserve
+        return max(self.blocked_until - now, (need - self._tokens) / self.current_rate)
+
+    def _slow_down(self, now):
+        # 并发请求往往同时被限流，每秒最多减速一次
+        if self._slowed_at is not None and now - self._slowed_at < 1:
+            return
+        self._slowed_at = now
+        self.current_rate = max(self.min_rate, self.current_rate / 2)
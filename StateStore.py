@@ -0,0 +1,207 @@
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+
+
+class StateStore:
+    """
+    基于SQLite的监控状态存储
+
+    保存check_new_activity使用的活动缓存和已报名活动（连同活动的开始、结束时间，供报名规则的冲突检查使用），
+    重启后加载，避免把所有开放活动当作新活动重复报名。数据库使用WAL模式；所有写操作先放入内存队列，由后台线程
+    合并成批量事务写入，轮询线程只需一次入队操作。
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=500):
+        """
+        Args:
+            path: 数据库文件路径
+            flush_interval: 后台线程最长的合并等待时间（秒）
+            batch_size: 单个事务最多包含的写操作数量
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._queue = queue.Queue()
+        self._closed = False
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS tracked_activities (
+                        activity_id INTEGER PRIMARY KEY,
+                        used_capacity INTEGER NOT NULL,
+                        capacity INTEGER NOT NULL,
+                        name TEXT,
+                        check_time TEXT
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS applied_activities (
+                        activity_id INTEGER PRIMARY KEY,
+                        applied_at REAL NOT NULL,
+                        start_time TEXT,
+                        end_time TEXT
+                    )
+                """)
+                # 旧版本创建的表没有时间列
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(applied_activities)")}
+                for column in ('start_time', 'end_time'):
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE applied_activities ADD COLUMN {column} TEXT")
+        finally:
+            conn.close()
+
+        self._writer = threading.Thread(target=self._writer_loop, name='state-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def load(self):
+        """
+        读取保存的状态
+
+        Returns:
+            tuple: (previous_activities, applied_activities)，格式与ActivityMonitor中的同名属性一致
+        """
+        conn = self._connect()
+        try:
+            previous_activities = {
+                activity_id: {
+                    'used_capacity': used_capacity,
+                    'capacity': capacity,
+                    'name': name,
+                    'check_time': check_time,
+                }
+                for activity_id, used_capacity, capacity, name, check_time in conn.execute(
+                    "SELECT activity_id, used_capacity, capacity, name, check_time FROM tracked_activities")
+            }
+            applied_activities = {
+                activity_id: 1 for (activity_id,) in conn.execute("SELECT activity_id FROM applied_activities")
+            }
+        finally:
+            conn.close()
+
+        logging.info(f"从 {self.path} 恢复状态: {len(previous_activities)} 个跟踪中的活动, "
+                     f"{len(applied_activities)} 个已报名活动")
+        return previous_activities, applied_activities
+
+    def load_booked(self):
+        """
+        读取已报名活动的时间
+
+        Returns:
+            list: [{'id', 'start_time', 'end_time'}]，只包含保存了时间的活动
+        """
+        conn = self._connect()
+        try:
+            return [
+                {'id': activity_id, 'start_time': start_time, 'end_time': end_time}
+                for activity_id, start_time, end_time in conn.execute(
+                    "SELECT activity_id, start_time, end_time FROM applied_activities "
+                    "WHERE start_time IS NOT NULL AND end_time IS NOT NULL")
+            ]
+        finally:
+            conn.close()
+
+    def put_tracked(self, activity_id, status):
+        """
+        记录活动缓存的更新
+
+        Args:
+            activity_id: 活动ID
+            status: {'used_capacity', 'capacity', 'name', 'check_time'}
+        """
+        self._queue.put(('tracked', activity_id, status))
+
+    def delete_tracked(self, activity_id):
+        """记录活动从缓存中移除"""
+        self._queue.put(('tracked', activity_id, None))
+
+    def put_applied(self, activity_id, start_time=None, end_time=None):
+        """记录报名成功的活动及其开始、结束时间"""
+        self._queue.put(('applied', activity_id, (time.time(), start_time, end_time)))
+
+    def flush(self):
+        """阻塞直到此前入队的写操作都已落盘"""
+        done = threading.Event()
+        self._queue.put(('flush', done, None))
+        done.wait()
+
+    def close(self):
+        """写完剩余操作后停止后台线程"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _writer_loop(self):
+        conn = self._connect()
+
+        try:
+            while True:
+                batch = [self._queue.get()]
+
+                # 在flush_interval内尽量合并更多的写操作
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and batch[-1] is not None and batch[-1][0] != 'flush':
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+
+                stop = batch[-1] is None
+                flushes = [op[1] for op in batch if op is not None and op[0] == 'flush']
+                self._write_batch(conn, [op for op in batch if op is not None and op[0] != 'flush'])
+
+                for done in flushes:
+                    done.set()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, ops):
+        if not ops:
+            return
+
+        # 同一活动的多次写入只保留最后一次
+        latest = {}
+        for kind, activity_id, value in ops:
+            latest[(kind, activity_id)] = value
+
+        upserts = []
+        deletes = []
+        applied = []
+        for (kind, activity_id), value in latest.items():
+            if kind == 'applied':
+                applied.append((activity_id, *value))
+            elif value is None:
+                deletes.append((activity_id,))
+            else:
+                upserts.append((activity_id, value['used_capacity'], value['capacity'],
+                                value.get('name'), value.get('check_time')))
+
+        try:
+            with conn:
+                conn.executemany("DELETE FROM tracked_activities WHERE activity_id = ?", deletes)
+                conn.executemany("INSERT OR REPLACE INTO tracked_activities VALUES (?, ?, ?, ?, ?)", upserts)
+                conn.executemany("INSERT OR REPLACE INTO applied_activities "
+                                 "(activity_id, applied_at, start_time, end_time) VALUES (?, ?, ?, ?)", applied)
+        except sqlite3.Error as e:
+            logging.error(f"写入状态数据库失败: {e}")
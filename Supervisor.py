@@ -0,0 +1,199 @@
+import os
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+import Metrics
+
+# 两个指标在子进程中更新，由子进程的MetricsServer（metrics_port）导出；Supervisor进程不提供/metrics
+SUPERVISOR_RESTARTS_TOTAL = Metrics.counter('supervisor_restarts_total', '监控子进程异常退出后的重启次数')
+SUPERVISOR_RECOVERY_SECONDS = Metrics.histogram('supervisor_recovery_seconds', '子进程异常退出到重启后第一次轮询成功的时间')
+
+
+def _signal_ready(monitor, ready, failed_at):
+    """第一次轮询成功后通知Supervisor，并记录这次恢复所用的时间"""
+    while not monitor.fetch_stats['polls']:
+        time.sleep(0.05)
+    if failed_at is not None:
+        SUPERVISOR_RECOVERY_SECONDS.observe(time.time() - failed_at)
+    ready.set()
+
+
+def _run_monitor(base_url, tokenfile, sno, monitor_kwargs, log_file, ready, restarts, recoveries, failed_at):
+    """
+    子进程入口：创建ActivityMonitor并运行监控循环，未处理的异常使进程以非0状态退出
+
+    Args:
+        restarts: 此前的重启次数
+        recoveries: 此前每次恢复所用的时间（秒）
+        failed_at: 上一个子进程异常退出的时间time.time()，首次启动时为None
+    """
+    from LogSetup import setup_logging, shutdown_logging
+    from ActivityMonitor import ActivityMonitor
+
+    # 新进程的指标从0开始，先补上之前的重启记录，/metrics中看到的是累计值
+    if restarts:
+        SUPERVISOR_RESTARTS_TOTAL.inc(restarts)
+    for seconds in recoveries:
+        SUPERVISOR_RECOVERY_SECONDS.observe(seconds)
+
+    setup_logging(log_file)
+    monitor = None
+    try:
+        monitor = ActivityMonitor(base_url, tokenfile, sno, **monitor_kwargs)
+        threading.Thread(target=_signal_ready, args=(monitor, ready, failed_at), name='supervisor-ready',
+                         daemon=True).start()
+        monitor.monitor_loop(raise_on_error=True)
+    finally:
+        # 退出前把已报名活动和活动缓存写入磁盘，重启后不会重复报名
+        if monitor is not None and monitor.state_store:
+            monitor.state_store.close()
+        shutdown_logging()
+
+
+class Supervisor:
+    """
+    监控进程守护
+
+    在子进程中运行ActivityMonitor.monitor_loop，子进程因未处理的异常或被杀死而退出时，按指数退避重启：
+    第一次等待min_backoff秒，之后每次翻倍，最多max_backoff秒；子进程稳定运行stable_after秒后退避时间复位。
+    子进程正常退出（例如Ctrl+C）时Supervisor也随之结束。
+
+    活动缓存和已报名活动通过StateStore保存在state_db中，重启后恢复，不会把开放中的活动当作新活动重复报名。
+    记录重启次数和恢复时间（从子进程退出到重启后第一次轮询成功），stats()返回汇总；
+    传入metrics_port时，子进程的/metrics中也有supervisor_restarts_total和supervisor_recovery_seconds。
+    """
+
+    def __init__(self, base_url, tokenfile, sno, state_db=None, log_file='activity_monitor.log', min_backoff=1,
+                 max_backoff=60, stable_after=60, max_restarts=None, **monitor_kwargs):
+        """
+        Args:
+            base_url: API基础URL
+            tokenfile: token存放文件名
+            sno: 学号
+            state_db: 保存状态的SQLite文件路径，默认为state_{学号}.db
+            log_file: 子进程的日志文件
+            min_backoff: 第一次重启前的等待时间（秒）
+            max_backoff: 重启等待时间的上限（秒）
+            stable_after: 子进程运行超过该时间（秒）后退出时，重启等待时间从min_backoff重新开始
+            max_restarts: 最多重启次数，None表示不限制
+            monitor_kwargs: 其余参数传给子进程中的ActivityMonitor，需要可以pickle
+        """
+        self.base_url = base_url
+        self.tokenfile = tokenfile
+        self.sno = sno
+        self.log_file = log_file
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.max_restarts = max_restarts
+
+        monitor_kwargs['state_db'] = state_db or f'state_{sno}.db'
+        self.monitor_kwargs = monitor_kwargs
+
+        self.restarts = 0
+        self.last_exitcode = None
+        self.recovery_seconds = []  # 每次恢复所用的时间（秒）
+
+        # 子进程不继承父进程的线程和日志处理器
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._stopping = False
+
+    def run(self):
+        """
+        运行并守护监控子进程，直到子进程正常退出、超过max_restarts或调用stop()
+
+        Returns:
+            int: 最后一个子进程的退出码
+        """
+        backoff = self.min_backoff
+        failed_at = None  # 最近一次异常退出的time.monotonic()，恢复后清空
+        failed_wall = None  # 同一时刻的time.time()，传给子进程计算恢复时间
+
+        try:
+            while not self._stopping:
+                ready = self._context.Event()
+                process = self._context.Process(
+                    target=_run_monitor,
+                    args=(self.base_url, self.tokenfile, self.sno, self.monitor_kwargs, self.log_file, ready,
+                          self.restarts, list(self.recovery_seconds), failed_wall),
+                    name=f'monitor-{self.sno}',
+                )
+                started = time.monotonic()
+                process.start()
+                self._process = process
+
+                if failed_at is not None:
+                    while process.is_alive() and not ready.wait(0.5):
+                        pass
+                    if ready.is_set():
+                        recovery = time.monotonic() - failed_at
+                        failed_at = failed_wall = None
+                        self.recovery_seconds.append(recovery)
+                        logging.info(f"监控已恢复，耗时 {recovery:.1f} 秒（累计重启 {self.restarts} 次）")
+
+                process.join()
+                self.last_exitcode = process.exitcode
+                if process.exitcode == 0 or self._stopping:
+                    logging.info(f"监控子进程已退出（退出码: {process.exitcode}）")
+                    return process.exitcode
+
+                if failed_at is None:
+                    failed_at = time.monotonic()
+                    failed_wall = time.time()
+                if time.monotonic() - started >= self.stable_after:
+                    backoff = self.min_backoff
+
+                if self.max_restarts is not None and self.restarts >= self.max_restarts:
+                    logging.error(f"监控子进程异常退出（退出码: {process.exitcode}），"
+                                  f"已达到最大重启次数 {self.max_restarts}，停止守护")
+                    return process.exitcode
+
+                self.restarts += 1
+                logging.error(f"监控子进程异常退出（退出码: {process.exitcode}），{backoff:.0f}秒后第 {self.restarts} 次重启")
+                time.sleep(backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+
+        except KeyboardInterrupt:
+            # 终端的Ctrl+C同时发给了子进程，等它自行退出
+            logging.info("守护进程被用户中断")
+            self._stopping = True
+            self._join(30)
+            return self.last_exitcode
+
+    def stop(self, timeout=30):
+        """停止守护，向子进程发送SIGINT使其保存状态后退出，可以从其他线程调用"""
+        self._stopping = True
+        process = self._process
+        if process is not None and process.is_alive():
+            os.kill(process.pid, signal.SIGINT)
+        self._join(timeout)
+
+    def _join(self, timeout):
+        """等待子进程退出，超时后强制结束"""
+        process = self._process
+        if process is None:
+            return
+
+        process.join(timeout)
+        if process.is_alive():
+            logging.warning(f"监控子进程未在{timeout}秒内退出，强制结束")
+            process.terminate()
+            process.join()
+        self.last_exitcode = process.exitcode
+
+    def stats(self):
+        """
+        Returns:
+            dict: 重启次数、最近的退出码、恢复时间的次数/平均/最大值（秒）
+        """
+        recovery = self.recovery_seconds
+        return {
+            'restarts': self.restarts,
+            'last_exitcode': self.last_exitcode,
+            'recoveries': len(recovery),
+            'recovery_avg': sum(recovery) / len(recovery) if recovery else None,
+            'recovery_max': max(recovery) if recovery else None,
+        }
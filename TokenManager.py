@@ -1,44 +1,100 @@
 import time
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+from contextlib import contextmanager
 
+# selenium在第一次需要打开浏览器时才导入（见_load_selenium），token有效时启动不加载
+webdriver = By = WebDriverWait = EC = Options = TimeoutException = None
 
-class TokenManager:
-    def __init__(self, tokenfile='token.cfg', headless=False):
-        self.chrome_options = Options()
+MIS_HOST = "mis.bjtu.edu.cn"
 
-        # 禁用自动化检测特征
-        self.chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        self.chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        self.chrome_options.add_experimental_option('useAutomationExtension', False)
+# 在sessionStorage和localStorage中依次查找token，找到即返回
+FIND_TOKEN_SCRIPT = """
+const keys = ['token', 'access_token', 'jwt_token', 'auth_token'];
+for (const key of keys) {
+    const value = sessionStorage.getItem(key) || localStorage.getItem(key);
+    if (value) {
+        return value;
+    }
+}
+return null;
+"""
 
-        self.chrome_options.add_argument('--disable-extensions')
-        self.chrome_options.add_argument('--disable-gpu')
-        self.chrome_options.add_argument('--no-sandbox')
-        self.chrome_options.add_argument('--disable-dev-shm-usage')
-        self.chrome_options.add_argument('--ignore-certificate-errors')
-        self.chrome_options.add_argument('--ignore-ssl-errors')
 
-        # 可选：无头模式（调试时可设置为False）
-        if headless:
-            self.chrome_options.add_argument('--headless')
+def _load_selenium():
+    """导入selenium并填充模块级名称，重复调用直接返回"""
+    global webdriver, By, WebDriverWait, EC, Options, TimeoutException
+    if webdriver is not None:
+        return
 
-        # 设置用户代理，避免被检测为自动化工具
-        self.chrome_options.add_argument(
-            '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    from selenium import webdriver as _webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.options import Options
+    from selenium.common.exceptions import TimeoutException
+    webdriver = _webdriver
+
+
+class TokenManager:
+    def __init__(self, tokenfile='token.cfg', headless=False, profile_dir='chrome_profile'):
+        """
+        Args:
+            tokenfile: token存放文件名
+            headless: 是否使用无头模式
+            profile_dir: 浏览器用户数据目录，保留CAS/MIS登录状态供下次复用；None表示每次使用全新的浏览器
+        """
+        self.headless = headless
+        self.profile_dir = profile_dir
+        self._chrome_options = None
 
         self.driver = None
         self.wait = None
         self.token_file = tokenfile
 
+        # 最近一次获取token各阶段的耗时（秒）
+        self.phase_timings = {}
+
         if not os.path.isfile(tokenfile):
             with open(tokenfile, 'w') as f:
                 f.write('')
 
+    @property
+    def chrome_options(self):
+        """浏览器配置，第一次使用时创建"""
+        if self._chrome_options is None:
+            self._chrome_options = self._build_chrome_options()
+        return self._chrome_options
+
+    def _build_chrome_options(self):
+        _load_selenium()
+        chrome_options = Options()
+
+        # 禁用自动化检测特征
+        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--ignore-certificate-errors')
+        chrome_options.add_argument('--ignore-ssl-errors')
+
+        # 可选：无头模式（调试时可设置为False）
+        if self.headless:
+            chrome_options.add_argument('--headless')
+
+        # 设置用户代理，避免被检测为自动化工具
+        chrome_options.add_argument(
+            '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+        # 持久化的用户数据目录，已有的CAS/MIS会话可以直接复用，无需重新登录
+        if self.profile_dir:
+            chrome_options.add_argument(f'--user-data-dir={os.path.abspath(self.profile_dir)}')
+
+        return chrome_options
+
 
     def get_token(self, sno):
         with open(self.token_file, 'r', encoding='utf-8') as f:
@@ -60,6 +116,7 @@ class TokenManager:
     def setup_browser(self):
         """初始化浏览器"""
         try:
+            _load_selenium()
             self.driver = webdriver.Chrome(options=self.chrome_options)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             self.wait = WebDriverWait(self.driver, 20)
@@ -108,44 +165,40 @@ class TokenManager:
             print("\n等待用户手动登录...")
             print("登录成功后程序会自动继续")
 
-            # 轮询检查是否登录成功（页面跳转）
-            max_wait_time = 120  # 最大等待时间2分钟
-            check_interval = 1  # 每3秒检查一次
-
-            for i in range(max_wait_time // check_interval):
-                current_url = self.driver.current_url
-
-                # 检查是否仍在登录页面（说明还未登录）
-                if current_url == original_url:
-                    print(f"\r等待登录... ({i * check_interval}秒)", end="", flush=True)
-                    time.sleep(check_interval)
-                else:
-                    # 跳转到其他页面，可能是登录成功
-                    # 等待页面加载
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "body"))
-                    )
-                    print(f"\n✓ 检测到页面跳转: {current_url}")
-                    return True
-
-            # 超时处理
-            print("\n❌ 登录超时，请检查是否登录成功")
-            return False
+            # 等待页面跳转（说明登录成功），最多等待2分钟
+            max_wait_time = 120
+            try:
+                WebDriverWait(self.driver, max_wait_time, poll_frequency=0.5).until(
+                    lambda driver: driver.current_url != original_url
+                )
+            except TimeoutException:
+                # 超时处理
+                print("\n❌ 登录超时，请检查是否登录成功")
+                return False
+
+            # 等待页面加载
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+            print(f"\n✓ 检测到页面跳转: {self.driver.current_url}")
+            return True
 
         except Exception as e:
             print(f"❌ 登录过程中出错: {e}")
             return False
 
-    def navigate_to_token_page(self):
-        """导航到包含token的页面"""
+    def navigate_to_token_page(self, stale_token=None):
+        """
+        导航到包含token的页面
+
+        Args:
+            stale_token: 需要被替换的旧token，浏览器存储中仍是它时继续等待
+        """
         print("正在导航到目标页面...")
 
-        token_url = "https://mis.bjtu.edu.cn/module/module/96/"
+        token_url = f"https://{MIS_HOST}/module/module/96/"
         self.driver.get(token_url)
 
-        # 使用混合等待策略
-        time.sleep(5)  # 基础等待
-
         try:
             WebDriverWait(self.driver, 15).until(
                 lambda driver: driver.execute_script("return document.readyState") == "complete"
@@ -156,6 +209,9 @@ class TokenManager:
                 EC.presence_of_element_located((By.XPATH, "//body"))
             )
 
+            # 等待页面脚本把token写入浏览器存储，代替固定时长的等待
+            self.wait_for_token(timeout=15, stale_token=stale_token)
+
             print("✓ 成功访问目标页面")
             return True
 
@@ -173,6 +229,72 @@ class TokenManager:
                 print("❌ 重试也失败")
                 return False
 
+    def wait_for_token(self, timeout=15, stale_token=None):
+        """
+        等待token出现在sessionStorage或localStorage中
+
+        Args:
+            timeout: 最长等待时间（秒）
+            stale_token: 旧token；浏览器配置会保留存储，存储中仍是旧token时继续等待页面写入新token
+
+        Returns:
+            str: token，超时返回None
+        """
+        def find_token(driver):
+            token = driver.execute_script(FIND_TOKEN_SCRIPT)
+            return token if token != stale_token else None
+
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(find_token)
+        except TimeoutException:
+            return None
+
+    def try_existing_session(self, timeout=10, stale_token=None):
+        """
+        直接访问token页面，若浏览器配置中已有有效的MIS会话，则无需登录即可取得token
+
+        Args:
+            timeout: 等待页面加载和token写入的最长时间（秒）
+            stale_token: 旧token，存储中只有它时视为没有取得新token
+
+        Returns:
+            str: token，会话无效时返回None
+        """
+        print("尝试复用已保存的登录状态...")
+        self.driver.get(f"https://{MIS_HOST}/module/module/96/")
+
+        try:
+            # 会话失效时会被重定向到CAS登录页
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+        except TimeoutException:
+            return None
+
+        if MIS_HOST not in self.driver.current_url:
+            print("已保存的登录状态无效，需要重新登录")
+            return None
+
+        token = self.wait_for_token(timeout, stale_token)
+        if token:
+            print("✓ 已复用保存的登录状态")
+        return token
+
+    @contextmanager
+    def _phase(self, name):
+        """记录一个阶段的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_timings[name] = time.perf_counter() - started
+
+    def _print_phase_timings(self):
+        if not self.phase_timings:
+            return
+        detail = ", ".join(f"{name}: {seconds:.2f}s" for name, seconds in self.phase_timings.items())
+        print(f"获取token各阶段耗时 - {detail}")
+
     def extract_token_from_storage(self):
         """从浏览器存储中提取token"""
         print("正在从浏览器存储中提取token...")
@@ -206,27 +328,51 @@ class TokenManager:
             print(f"❌ 提取token过程中出错: {e}")
             return None
 
-    def get_token_automatically(self, sno):
-        """自动获取token的主函数"""
+    def get_token_automatically(self, sno, stale_token=None):
+        """
+        自动获取token的主函数
+
+        Args:
+            sno: 学号
+            stale_token: 刷新时传入当前token，浏览器存储中残留的旧token不会被当作新token返回
+        """
         print("开始自动获取BJTU token...")
+        self.phase_timings = {}
 
-        if not self.setup_browser():
+        with self._phase('setup_browser'):
+            browser_ready = self.setup_browser()
+        if not browser_ready:
             return None
 
         try:
+            # 浏览器配置中保存了有效会话时，直接取得token
+            with self._phase('reuse_session'):
+                token = self.try_existing_session(stale_token=stale_token)
+            if token:
+                return token
+
             # 第一步：CAS登录
-            if not self.login_to_cas(sno):
+            with self._phase('login_to_cas'):
+                logged_in = self.login_to_cas(sno)
+            if not logged_in:
                 return None
 
-            # 核心代码勿动
-            time.sleep(5)  # 等待mis网站完全加载
+            # 等待mis网站完全加载
+            with self._phase('wait_mis'):
+                WebDriverWait(self.driver, 30, poll_frequency=0.2).until(
+                    lambda driver: MIS_HOST in driver.current_url
+                    and driver.execute_script("return document.readyState") == "complete"
+                )
 
             # 第二步：导航到token页面
-            if not self.navigate_to_token_page():
+            with self._phase('navigate_to_token_page'):
+                navigated = self.navigate_to_token_page(stale_token)
+            if not navigated:
                 return None
 
             # 第三步：提取token
-            token = self.extract_token_from_storage()
+            with self._phase('extract_token'):
+                token = self.extract_token_from_storage()
 
             if token:
                 print(f"\n🎉 成功获取token!")
@@ -240,7 +386,9 @@ class TokenManager:
             return None
         finally:
             if self.driver:
-                self.driver.quit()
+                with self._phase('quit_browser'):
+                    self.driver.quit()
+            self._print_phase_timings()
 
     def write_token_to_file(self, t):
         with open(self.token_file, 'w', encoding='utf-8') as f:
@@ -0,0 +1,145 @@
+import time
+import socket
+import logging
+import threading
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import NewConnectionError
+import Metrics
+
+HTTP_REQUESTS_TOTAL = Metrics.counter('http_requests_total', '经过连接池发出的HTTP请求数')
+HTTP_CONNECTIONS_TOTAL = Metrics.counter('http_connections_total', '新建的TCP连接数（握手次数）')
+DNS_LOOKUPS_TOTAL = Metrics.counter('dns_lookups_total', 'DNS解析次数', ('result',))
+
+
+def _socket_options():
+    """TCP_NODELAY关闭Nagle算法，SO_KEEPALIVE让内核探测失效的空闲连接"""
+    options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # Linux下缩短keepalive探测的等待时间，其他平台使用系统默认值
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options += [(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30), (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)]
+    return options
+
+
+class Transport(HTTPAdapter):
+    """
+    ActivityMonitor使用的HTTP传输层
+
+    在requests的HTTPAdapter基础上：
+    - 缓存API主机的DNS解析结果，新建连接时不再查询DNS；连接失败时清除缓存，下次重新解析
+    - 连接池大小可配置，所有连接开启TCP_NODELAY和SO_KEEPALIVE
+    - 统计请求数和新建连接（握手）数，用于计算连接复用率
+    keepalive_interval是建议的保活请求间隔，由ApplyDispatcher定期发送轻量请求，
+    应小于服务器的keep-alive超时时间。
+    """
+
+    def __init__(self, base_url, pool_size=10, dns_ttl=300, keepalive_interval=20, **kwargs):
+        """
+        Args:
+            base_url: API基础URL，创建时预先解析其主机名
+            pool_size: 连接池中保留的最大连接数
+            dns_ttl: DNS解析结果的缓存时间（秒），0表示不缓存
+            keepalive_interval: 保活请求间隔（秒）
+            kwargs: 其余参数传给HTTPAdapter
+        """
+        self.dns_ttl = dns_ttl
+        self.keepalive_interval = keepalive_interval
+
+        self._dns_cache = {}  # (主机名, 端口) -> (IP, 过期时间)
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'handshakes': 0, 'dns_lookups': 0, 'dns_hits': 0}
+
+        super().__init__(pool_connections=1, pool_maxsize=pool_size, **kwargs)
+
+        parsed = urlparse(base_url)
+        if parsed.hostname:
+            try:
+                self.resolve(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+            except OSError as e:
+                logging.warning(f"预解析 {parsed.hostname} 失败: {e}")
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault('socket_options', _socket_options())
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+        transport = self
+
+        class CachedHTTPConnection(HTTPConnection):
+            def _new_conn(self):
+                return transport._new_conn(self, super()._new_conn)
+
+        class CachedHTTPSConnection(HTTPSConnection):
+            def _new_conn(self):
+                return transport._new_conn(self, super()._new_conn)
+
+        class CachedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CachedHTTPConnection
+
+        class CachedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CachedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CachedHTTPConnectionPool,
+            'https': CachedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        self._count('requests')
+        HTTP_REQUESTS_TOTAL.inc()
+        return super().send(request, **kwargs)
+
+    def resolve(self, host, port):
+        """
+        返回主机名对应的IP，缓存未过期时直接返回缓存结果
+
+        Raises:
+            OSError: 解析失败
+        """
+        key = (host, port)
+        cached = self._dns_cache.get(key)
+        if cached and cached[1] > time.monotonic():
+            self._count('dns_hits')
+            DNS_LOOKUPS_TOTAL.inc(labels=('hit',))
+            return cached[0]
+
+        self._count('dns_lookups')
+        DNS_LOOKUPS_TOTAL.inc(labels=('miss',))
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        if self.dns_ttl > 0:
+            self._dns_cache[key] = (address, time.monotonic() + self.dns_ttl)
+        return address
+
+    def stats(self):
+        """
+        Returns:
+            dict: 请求数、握手次数、连接复用率、DNS查询与缓存命中次数
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        requests = stats['requests']
+        stats['reuse_rate'] = 1 - stats['handshakes'] / requests if requests else None
+        return stats
+
+    def _new_conn(self, conn, new_conn):
+        """新建连接：用缓存的IP建立TCP连接，TLS的SNI和证书校验仍使用原主机名"""
+        key = (conn.host, conn.port)
+        try:
+            conn._dns_host = self.resolve(conn.host, conn.port)
+        except OSError as e:
+            # 解析失败交给urllib3按原主机名处理并给出原有的错误信息
+            logging.debug(f"解析 {conn.host} 失败: {e}")
+            conn._dns_host = conn.host
+
+        self._count('handshakes')
+        HTTP_CONNECTIONS_TOTAL.inc()
+        try:
+            return new_conn()
+        except NewConnectionError:
+            self._dns_cache.pop(key, None)
+            raise
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
@@ -0,0 +1,30 @@
+"""压测脚本共用的辅助函数"""
+import os
+import time
+import tempfile
+
+import jwt
+
+# 只用于MockServer，服务器不校验签名
+BENCHMARK_SECRET = 'activity-monitor-benchmark-secret-key'
+
+
+def write_token_file():
+    """
+    写入一个30天后过期的token到临时文件，调用方负责删除
+
+    Returns:
+        str: token文件路径
+    """
+    token = jwt.encode({'exp': int(time.time()) + 30 * 24 * 3600}, BENCHMARK_SECRET, algorithm='HS256')
+    fd, path = tempfile.mkstemp(suffix='.cfg')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return path
+
+
+def percentile(values, p):
+    """返回values的第p百分位数（最近秩）"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
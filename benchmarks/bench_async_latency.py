@@ -0,0 +1,97 @@
+"""
+对比同步monitor_loop与AsyncActivityMonitor的"名额开放 -> 报名请求到达"延迟
+
+使用本地MockXuefenServer，并用一个带固定延迟的假邮件通知器模拟慢速SMTP，
+通知器与配置了smtp_config时一样，通过EmailSink订阅事件总线上的报名结果。
+
+    python benchmarks/bench_async_latency.py --slots 20 --email-delay 1.0
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ActivityMonitor import ActivityMonitor
+from AsyncActivityMonitor import AsyncActivityMonitor
+from EventBus import EmailSink
+from MockServer import MockXuefenServer, make_activity
+from _common import percentile, write_token_file
+
+
+class SlowNotifier:
+    """模拟SMTP握手与发送耗时的通知器"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def send_email(self, subject, html_content):
+        time.sleep(self.delay)
+        return True
+
+
+def run_case(monitor_cls, slots, interval, gap, email_delay):
+    server = MockXuefenServer([make_activity(i) for i in range(1, slots + 1)]).start()
+    tokenfile = write_token_file()
+
+    try:
+        monitor = monitor_cls(server.base_url, tokenfile, 'bench', check_interval=interval)
+        # 没有传入smtp_config时不会订阅邮件，这里手动订阅，让慢速通知器真正处理每个报名结果
+        monitor.email_notifier = SlowNotifier(email_delay)
+        monitor.event_bus.subscribe(EmailSink(monitor), EmailSink.event_types, name='email')
+
+        if isinstance(monitor, AsyncActivityMonitor):
+            runner = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+        else:
+            runner = threading.Thread(target=monitor.monitor_loop, daemon=True)
+        runner.start()
+
+        # 等待第一次轮询建立基线
+        time.sleep(interval * 3)
+
+        for activity_id in range(1, slots + 1):
+            server.open_slot(activity_id)
+            time.sleep(gap)
+
+        deadline = time.perf_counter() + slots * (email_delay + interval) + 5
+        while len(server.latencies()) < slots and time.perf_counter() < deadline:
+            time.sleep(0.05)
+
+        if isinstance(monitor, AsyncActivityMonitor):
+            monitor.stop()
+
+        return server.latencies()
+    finally:
+        server.stop()
+        os.remove(tokenfile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slots', type=int, default=20, help='开放名额的活动数量')
+    parser.add_argument('--interval', type=float, default=0.2, help='轮询间隔（秒）')
+    parser.add_argument('--gap', type=float, default=0.3, help='相邻两次名额开放的间隔（秒）')
+    parser.add_argument('--email-delay', type=float, default=1.0, help='模拟的邮件发送耗时（秒）')
+    args = parser.parse_args()
+
+    # 压测时不需要监控器的日志输出
+    logging.disable(logging.CRITICAL)
+
+    for name, cls in (('sync', ActivityMonitor), ('async', AsyncActivityMonitor)):
+        latencies = run_case(cls, args.slots, args.interval, args.gap, args.email_delay)
+        if not latencies:
+            print(f"{name:>5}: 没有成功的报名")
+            continue
+        print(f"{name:>5}: applied={len(latencies)}/{args.slots} "
+              f"p50={percentile(latencies, 50) * 1000:.1f}ms "
+              f"p99={percentile(latencies, 99) * 1000:.1f}ms "
+              f"mean={statistics.mean(latencies) * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+端到端压测：在独立进程中启动MockServer，驱动ActivityMonitor.monitor_loop运行一段时间，
+统计每秒轮询次数、名额开放到收到报名请求的延迟分位数、CPU时间和最大RSS，
+结果写入JSON文件，便于对比不同版本。
+
+    python benchmarks/bench_e2e.py --duration 20 --output bench_e2e.json
+    python benchmarks/bench_e2e.py --scenario large --interval 0.5
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from _common import percentile, write_token_file
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = {
+    'baseline': {'activities': 30, 'latency': 0.01, 'open_every': 0.5},
+    'large': {'activities': 500, 'latency': 0.02, 'open_every': 0.5},
+    'errors': {'activities': 100, 'latency': 0.01, 'error_rate': 0.05, 'open_every': 0.5},
+    'etag': {'activities': 500, 'latency': 0.02, 'etag': True, 'open_every': 1.0},
+}
+
+
+def start_mock(config):
+    """在子进程中启动MockServer，返回(进程, base_url)"""
+    command = [
+        sys.executable, os.path.join(ROOT, 'MockServer.py'),
+        '--port', '0',
+        '--activities', str(config['activities']),
+        '--latency', str(config.get('latency', 0)),
+        '--error-rate', str(config.get('error_rate', 0)),
+        '--open-every', str(config.get('open_every', 0)),
+    ]
+    if config.get('etag'):
+        command.append('--etag')
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    return process, base_url
+
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，Linux以KB为单位
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_child(name, duration, interval):
+    """在当前进程中运行一个场景，输出一行JSON结果"""
+    from ActivityMonitor import ActivityMonitor
+
+    logging.disable(logging.CRITICAL)
+    config = SCENARIOS[name]
+    mock, base_url = start_mock(config)
+
+    tokenfile = write_token_file()
+
+    try:
+        monitor = ActivityMonitor(base_url, tokenfile, 'bench', check_interval=interval)
+
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        threading.Thread(target=monitor.monitor_loop, daemon=True).start()
+
+        time.sleep(duration)
+
+        cpu_seconds = time.process_time() - cpu_started
+        wall_seconds = time.perf_counter() - wall_started
+
+        with urllib.request.urlopen(f"{base_url}/__mock__/stats", timeout=10) as response:
+            stats = json.loads(response.read())
+    finally:
+        mock.terminate()
+        mock.wait()
+        os.remove(tokenfile)
+
+    events = stats['open_events']
+    latencies = [e['applied_at'] - e['opened_at'] for e in events if e['applied_at'] is not None]
+
+    result = {
+        'scenario': name,
+        'config': config,
+        'interval': interval,
+        'duration': wall_seconds,
+        'polls': monitor.fetch_stats['polls'],
+        'polls_per_second': monitor.fetch_stats['polls'] / wall_seconds,
+        'fetch_stats': monitor.fetch_stats,
+        'slots_opened': len(events),
+        'slots_applied': len(latencies),
+        'apply_latency_ms': None if not latencies else {
+            'p50': percentile(latencies, 50) * 1000,
+            'p90': percentile(latencies, 90) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'max': max(latencies) * 1000,
+        },
+        'cpu_seconds': cpu_seconds,
+        'cpu_percent': cpu_seconds / wall_seconds * 100,
+        'max_rss_kb': max_rss_kb(),
+        'server_requests': stats['request_counts'],
+    }
+
+    print(json.dumps(result, ensure_ascii=False), flush=True)
+    # 监控线程无法停止，直接退出进程
+    os._exit(0)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='要运行的场景，可重复指定，默认运行全部')
+    parser.add_argument('--duration', type=float, default=15, help='每个场景的运行时间（秒）')
+    parser.add_argument('--interval', type=float, default=1.0, help='监控器的常规轮询间隔（秒）')
+    parser.add_argument('--output', default='bench_e2e.json', help='结果文件路径')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.duration, args.interval)
+        return
+
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        # 每个场景在独立的进程中运行，CPU和RSS互不干扰
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name,
+             '--duration', str(args.duration), '--interval', str(args.interval)],
+            stdout=subprocess.PIPE, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results[name] = result
+
+        latency = result['apply_latency_ms'] or {}
+        print(f"{name:>8}: {result['polls_per_second']:.2f} polls/s, "
+              f"applied {result['slots_applied']}/{result['slots_opened']}, "
+              f"p50={latency.get('p50', float('nan')):.1f}ms p99={latency.get('p99', float('nan')):.1f}ms, "
+              f"cpu={result['cpu_percent']:.1f}%, rss={result['max_rss_kb']}KB")
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+回放压测：对MockServer实时轮询并用record_feed记录原始响应，再用FeedRecorder.ReplayDriver离线回放，
+统计回放速度，并检查回放检测到的可报名活动、发出的报名请求与实时轮询一致。
+
+回放时ReplaySession替代ActivityMonitor.session，所有请求都经过ActivityMonitor._request；
+传输层改动导致回放失败或结果不一致时以非0状态退出。
+
+    python benchmarks/bench_replay.py
+    python benchmarks/bench_replay.py --polls 200 --activities 500
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from _common import write_token_file
+
+
+def record_live(base_url, tokenfile, feed_path, server, polls, open_ratio, seed):
+    """
+    实时轮询并记录原始响应
+
+    Returns:
+        list: 检测到的可报名活动ID，按轮询顺序
+    """
+    from ActivityMonitor import ActivityMonitor
+
+    rng = random.Random(seed)
+    monitor = ActivityMonitor(base_url, tokenfile, 'bench', record_feed=feed_path)
+    detections = []
+    try:
+        for _ in range(polls):
+            if rng.random() < open_ratio:
+                server.open_random_slot()
+
+            data = monitor.fetch_all_activities()
+            if not data or 'results' not in data or monitor.last_fetch_unchanged:
+                continue
+            detections.extend(activity['id'] for activity in monitor.check_new_activity(data['results']))
+    finally:
+        monitor.feed_recorder.close()
+    return detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--polls', type=int, default=100, help='实时轮询次数')
+    parser.add_argument('--activities', type=int, default=200, help='模拟服务器的活动数量')
+    parser.add_argument('--open-ratio', type=float, default=0.3, help='每次轮询前释放一个名额的概率')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from MockServer import MockXuefenServer, make_catalogue
+    from FeedRecorder import ReplayDriver
+
+    logging.disable(logging.CRITICAL)
+    server = MockXuefenServer(make_catalogue(args.activities, seed=args.seed)).start()
+    tokenfile = write_token_file()
+    fd, feed_path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+
+    try:
+        started = time.perf_counter()
+        live = record_live(server.base_url, tokenfile, feed_path, server, args.polls, args.open_ratio, args.seed)
+        live_elapsed = time.perf_counter() - started
+
+        result = ReplayDriver(feed_path).run()
+        size = os.path.getsize(feed_path)
+    finally:
+        server.stop()
+        os.remove(tokenfile)
+        os.remove(feed_path)
+
+    replayed = [activity_id for _, activity_id in result['detections']]
+    print(f"记录 {args.polls} 次轮询（{size / 1024:.1f} KB），实时 {live_elapsed:.2f} 秒，"
+          f"回放 {result['elapsed']:.2f} 秒（{result['polls'] / result['elapsed']:.0f} 次/秒）")
+    print(f"可报名活动: 实时 {len(live)} 个，回放 {len(replayed)} 个；回放发出 {result['apply_posts']} 个报名请求")
+
+    problems = []
+    if result['polls'] != args.polls:
+        problems.append(f"回放的轮询数 {result['polls']} 与记录的 {args.polls} 不同")
+    if replayed != live:
+        problems.append("回放检测到的可报名活动与实时轮询不一致")
+    if result['apply_posts'] != len(set(live)):
+        problems.append(f"回放发出的报名请求数 {result['apply_posts']} 与可报名活动数 {len(set(live))} 不同")
+
+    if problems:
+        for problem in problems:
+            print(f"不一致: {problem}")
+        sys.exit(1)
+    print("回放结果一致")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+对比check_new_activity（逐项字典比较）与CapacitySnapshot（列式整体比较）的耗时，
+并逐轮校验两者结果一致；另外在每轮含有重复活动的数据上校验三种实现结果一致。
+
+    python benchmarks/bench_snapshot_diff.py --activities 10000 --polls 200
+"""
+import gc
+import os
+import sys
+import time
+import random
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CapacitySnapshot as snapshot_module
+from ActivityMonitor import ActivityMonitor
+from CapacitySnapshot import CapacitySnapshot
+from MockServer import make_activity
+
+
+def generate_polls(activities, polls, change_ratio, seed):
+    """生成每轮的活动列表，每轮随机改变一部分活动的报名人数或状态"""
+    rng = random.Random(seed)
+    current = [make_activity(i, capacity=rng.randint(5, 50)) for i in range(1, activities + 1)]
+    for activity in current:
+        activity['used_capacity'] = rng.randint(0, activity['capacity'])
+
+    rounds = []
+    for _ in range(polls):
+        for activity in rng.sample(current, int(activities * change_ratio)):
+            if rng.random() < 0.05:
+                activity['status'] = '已结束' if activity['status'] == '报名中' else '报名中'
+            else:
+                activity['used_capacity'] = rng.randint(0, activity['capacity'])
+        rounds.append([dict(a) for a in current])
+    return rounds
+
+
+def run_dict(rounds):
+    state = SimpleNamespace(previous_activities={}, capacity_snapshot=None, state_store=None)
+    results = []
+    started = time.perf_counter()
+    for activities in rounds:
+        results.append([a['id'] for a in ActivityMonitor._diff_activities(state, activities)])
+    return time.perf_counter() - started, results
+
+
+def add_duplicates(rounds, ratio, seed):
+    """
+    模拟翻页期间列表移动：每轮把一部分活动在列表中再放一次，重复的一份名额状态随机
+
+    Returns:
+        list: 新的每轮活动列表
+    """
+    rng = random.Random(seed)
+    result = []
+    for activities in rounds:
+        activities = list(activities)
+        for activity in rng.sample(activities, max(1, int(len(activities) * ratio))):
+            duplicate = dict(activity, used_capacity=rng.randint(0, activity['capacity']))
+            activities.insert(rng.randrange(len(activities) + 1), duplicate)
+        result.append(activities)
+    return result
+
+
+def run_engines(rounds):
+    """
+    依次运行字典实现、列式快照（numpy）和列式快照（标准库）
+
+    Returns:
+        list: [(名称, 耗时, 每轮结果)]，第一项为字典实现
+    """
+    dict_time, expected = run_dict(rounds)
+    results = [('dict', dict_time, expected)]
+
+    engines = [('columnar', None)]
+    if snapshot_module.np is not None:
+        engines.append(('columnar (no numpy)', 'disable'))
+
+    for name, mode in engines:
+        saved = snapshot_module.np
+        if mode == 'disable':
+            snapshot_module.np = None
+        try:
+            elapsed, engine_results = run_snapshot(rounds)
+        finally:
+            snapshot_module.np = saved
+        results.append((name, elapsed, engine_results))
+    return results
+
+
+def run_snapshot(rounds):
+    snapshot = CapacitySnapshot()
+    results = []
+    started = time.perf_counter()
+    for activities in rounds:
+        results.append([a['id'] for a in snapshot.diff(activities)])
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--activities', type=int, default=10000, help='活动数量')
+    parser.add_argument('--polls', type=int, default=200, help='轮询次数')
+    parser.add_argument('--change-ratio', type=float, default=0.01, help='每轮发生变化的活动比例')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.01, help='一致性检查中每轮重复出现的活动比例')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rounds = generate_polls(args.activities, args.polls, args.change_ratio, args.seed)
+
+    # 与timeit一样关闭垃圾回收，避免预先生成的大量活动字典干扰计时
+    gc.collect()
+    gc.disable()
+
+    consistent = True
+    (_, dict_time, expected), *engines = run_engines(rounds)
+    print(f"    dict: {dict_time / args.polls * 1000:.3f} ms/poll")
+    for name, elapsed, results in engines:
+        consistent &= results == expected
+        status = '一致' if results == expected else '不一致!'
+        print(f"{name:>8}: {elapsed / args.polls * 1000:.3f} ms/poll "
+              f"({dict_time / elapsed:.2f}x)，结果{status}")
+
+    # 同一次轮询中出现重复活动时，三种实现的结果也必须一致
+    duplicated = add_duplicates(rounds[:20], args.duplicate_ratio, args.seed)
+    (_, _, expected), *engines = run_engines(duplicated)
+    for name, _, results in engines:
+        consistent &= results == expected
+        print(f"{name:>8}: 含重复活动时结果{'一致' if results == expected else '不一致!'}")
+
+    if not consistent:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+启动耗时压测：token已缓存时，从启动进程到完成第一次轮询的时间，以及导入耗时的分解。
+
+每次运行都在新的Python进程中进行，分别记录导入ActivityMonitor、创建监控器、第一次fetch_all_activities的耗时，
+并检查selenium、numpy等可选依赖是否在启动时被加载。导入耗时来自python -X importtime，按ActivityMonitor直接导入的模块汇总。
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 15
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 启动时不应加载的可选依赖
+OPTIONAL_MODULES = ('selenium', 'numpy', 'sqlite3', 'smtplib')
+
+
+def run_child(base_url, tokenfile):
+    """在当前进程中启动监控器并完成一次轮询，输出一行JSON结果"""
+    started = time.perf_counter()
+    from ActivityMonitor import ActivityMonitor
+    imported = time.perf_counter()
+
+    logging.disable(logging.CRITICAL)
+    monitor = ActivityMonitor(base_url, tokenfile, 'bench')
+    created = time.perf_counter()
+
+    data = monitor.fetch_all_activities()
+    polled = time.perf_counter()
+
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'init_ms': (created - imported) * 1000,
+        'first_poll_ms': (polled - created) * 1000,
+        'activities': len(data['results']) if data else None,
+        'loaded': [name for name in OPTIONAL_MODULES if name in sys.modules],
+    }), flush=True)
+    os._exit(0)
+
+
+def import_breakdown(top):
+    """
+    用-X importtime导入ActivityMonitor
+
+    Returns:
+        tuple: (ActivityMonitor直接导入的模块中累计耗时最多的[(模块, 毫秒)], 导入ActivityMonitor的总毫秒数)
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ActivityMonitor'],
+                            cwd=ROOT, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, check=True).stderr
+
+    modules = []
+    total = None
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        ms = int(cumulative) / 1000
+        # 每层嵌套缩进两个空格：' ActivityMonitor'是-c直接导入的模块，'   xxx'是它直接导入的模块
+        if name.strip() == 'ActivityMonitor':
+            total = ms
+        elif name.startswith('   ') and not name.startswith('    '):
+            modules.append((name.strip(), ms))
+
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return modules[:top], total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='重复启动的次数')
+    parser.add_argument('--activities', type=int, default=100, help='模拟服务器的活动数量')
+    parser.add_argument('--top', type=int, default=10, help='导入耗时分解中显示的模块数')
+    parser.add_argument('--child', nargs=2, metavar=('BASE_URL', 'TOKENFILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    from MockServer import MockXuefenServer, make_catalogue
+    from _common import write_token_file
+
+    server = MockXuefenServer(make_catalogue(args.activities)).start()
+    tokenfile = write_token_file()
+
+    results = []
+    try:
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', server.base_url, tokenfile],
+                                    cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True).stdout
+            wall_ms = (time.perf_counter() - started) * 1000
+            result = json.loads(output.strip().splitlines()[-1])
+            result['wall_ms'] = wall_ms
+            results.append(result)
+    finally:
+        server.stop()
+        os.remove(tokenfile)
+
+    print(f"进程启动到第一次轮询完成（{args.runs} 次中位数）:")
+    for key, label in (('wall_ms', '总计（含解释器启动）'), ('import_ms', '导入ActivityMonitor'),
+                       ('init_ms', '创建监控器'), ('first_poll_ms', '第一次轮询')):
+        print(f"  {label:<16} {statistics.median(r[key] for r in results):8.1f} ms")
+
+    loaded = sorted({name for r in results for name in r['loaded']})
+    print(f"  启动时加载的可选依赖: {', '.join(loaded) if loaded else '无'}")
+
+    modules, total = import_breakdown(args.top)
+    print(f"\n导入耗时分解（-X importtime，导入ActivityMonitor共 {total:.1f} ms）:")
+    for name, ms in modules:
+        print(f"  {name:<24} {ms:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+对比response.json()完整解码与ActivityDecoder增量解码一页活动列表的CPU耗时和内存分配，
+并逐轮校验check_new_activity的结果一致。cold为每轮都用新的解码器，即没有可复用的上一轮结果。
+
+    python benchmarks/bench_streaming_decode.py --activities 1000 --polls 100
+    python benchmarks/bench_streaming_decode.py --description-bytes 2000
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ActivityMonitor import ActivityMonitor
+from ActivityDecoder import ActivityDecoder
+from MockServer import make_activity
+
+
+def generate_bodies(activities, polls, change_ratio, description_bytes, seed):
+    """生成每轮的原始响应体，每轮随机改变一部分活动的报名人数"""
+    rng = random.Random(seed)
+    current = []
+    for activity_id in range(1, activities + 1):
+        activity = make_activity(activity_id, capacity=rng.randint(5, 50))
+        activity['used_capacity'] = rng.randint(0, activity['capacity'])
+        activity['description'] = '活动介绍' * (description_bytes // 12)
+        activity['organizers'] = [{'name': '校团委', 'phone': '0000-0000000'}]
+        current.append(activity)
+
+    bodies = []
+    for _ in range(polls):
+        for activity in rng.sample(current, int(activities * change_ratio)):
+            activity['used_capacity'] = rng.randint(0, activity['capacity'])
+        body = {'count': activities, 'next': None, 'previous': None, 'results': current}
+        bodies.append(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+    return bodies
+
+
+def run(decode, bodies):
+    """依次解码并比较，返回(每轮CPU秒数, 每轮可报名活动ID)"""
+    state = SimpleNamespace(previous_activities={}, capacity_snapshot=None, state_store=None)
+    results = []
+    started = time.process_time()
+    for body in bodies:
+        data = decode(body)
+        results.append([a['id'] for a in ActivityMonitor._diff_activities(state, data['results'])])
+    return (time.process_time() - started) / len(bodies), results
+
+
+def measure_allocations(decode, bodies):
+    """返回(单轮解码的峰值分配, 解码结果占用的内存)，单位字节，取各轮平均值"""
+    peaks = []
+    retained = []
+    for body in bodies:
+        tracemalloc.start()
+        data = decode(body)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+        del data
+    return sum(peaks) / len(peaks), sum(retained) / len(retained)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--activities', type=int, default=1000, help='每页活动数量')
+    parser.add_argument('--polls', type=int, default=100, help='轮询次数')
+    parser.add_argument('--change-ratio', type=float, default=0.01, help='每轮发生变化的活动比例')
+    parser.add_argument('--description-bytes', type=int, default=300, help='每个活动介绍字段的大小')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    bodies = generate_bodies(args.activities, args.polls, args.change_ratio, args.description_bytes, args.seed)
+    print(f"每页 {args.activities} 个活动，响应体 {len(bodies[0]) / 1024:.0f} KB，{args.polls} 轮")
+
+    gc.collect()
+    gc.disable()
+
+    def full(body):
+        return json.loads(body)
+
+    decoder = ActivityDecoder()
+
+    def incremental(body):
+        return decoder.decode_page(body)
+
+    def cold(body):
+        return ActivityDecoder().decode_page(body)
+
+    full_cpu, expected = run(full, bodies)
+    rows = [('json.loads', full_cpu, True)]
+    for name, decode in (('incremental', incremental), ('cold', cold)):
+        cpu, results = run(decode, bodies)
+        rows.append((name, cpu, results == expected))
+
+    gc.enable()
+    sample = bodies[-min(10, len(bodies)):]
+    allocations = {
+        'json.loads': measure_allocations(full, sample),
+        'incremental': measure_allocations(incremental, sample),
+        'cold': measure_allocations(cold, sample),
+    }
+
+    for name, cpu, same in rows:
+        peak, retained = allocations[name]
+        print(f"{name:>12}: {cpu * 1000:8.3f} ms/poll ({full_cpu / cpu:.2f}x), "
+              f"peak {peak / 1024:8.1f} KB, retained {retained / 1024:8.1f} KB, "
+              f"结果{'一致' if same else '不一致!'}")
+
+    print(f"incremental: 解码 {decoder.stats['decoded']} 个活动，复用 {decoder.stats['reused']} 个，"
+          f"回退 {decoder.stats['fallbacks']} 页")
+
+
+if __name__ == '__main__':
+    main()